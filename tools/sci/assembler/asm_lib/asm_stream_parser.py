@@ -0,0 +1,369 @@
+# Hand written, single pass parser for .sca files
+# produces exactly the same tree as asm_parser (PLY), but without building the lists recursively
+# (PLY's 'a : b a' rules copy the list on every item, which is quadratic for long sections)
+# on any input it doesn't understand it raises SyntaxError - the caller should then fall back to asm_parser,
+# which gives the detailed error messages
+
+import re
+from functools import lru_cache
+
+from opcodes import SciOpcodes, OPCODES_INFO
+from misc import de_escape_string
+from asm_lexer import reserved
+
+# same regular expressions (and same priority) as in asm_lexer
+TOKENS_REGEXES = (
+    ('ID', r'[\+|-]?[a-zA-Z_][a-zA-Z_0-9]*[\?]?'),
+    ('HEX', r'0x[A-Fa-f0-9]+'),
+    ('NUMBER', r'[-]?\d+'),
+    ('DOUBLE_STRING', r'\"(?:[^\\\n]|(?:\\.))*?\"'),
+    ('SINGLE_STRING', r"\'(?:[^\\\n]|(?:\\.))*?\'"),
+    ('DOT', r'\.'),
+    ('COMMA', r','),
+    ('COLON', r':'),
+    ('EQUALS', r'='),
+    ('LBRACKET', r'\['),
+    ('RBRACKET', r'\]'),
+    ('LCURLY', r'\{'),
+    ('RCURLY', r'\}'),
+    ('POUND', r'\#'),
+    ('ERROR', r'.'),
+    ('END', r'\Z'),
+)
+# spaces, tabs, newlines and comments are skipped as part of the following token
+IGNORED_REGEX = r'(?:[ \t\n]+|;.*)*'
+TOKENS_RE = re.compile(IGNORED_REGEX + '(?:' + '|'.join(f'(?P<{name}>{regex})' for name, regex in TOKENS_REGEXES) + ')')
+
+# same names SciOpcodes._missing_ accepts
+OPCODES = {opcode.name[len('op_'):]: opcode for opcode in SciOpcodes}
+
+
+@lru_cache(maxsize=None)
+def get_opcode(name):
+    return OPCODES.get(name.replace("?", "_").replace("-", "minus").replace("+", "plus"))
+
+
+@lru_cache(maxsize=None)
+def get_id_kind(name):
+    kind = reserved.get(name, 'ID')
+    opcode = get_opcode(name)
+    if opcode is not None:
+        if opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss] or OPCODES_INFO[opcode].relative:
+            kind = 'OPCODE_LABEL'
+        elif opcode == SciOpcodes.op_callk:
+            kind = 'OPCODE_CALLK'
+        else:
+            kind = 'OPCODE'
+    return kind
+
+
+def hex_to_bytes(s):
+    val = s[2:]
+    if len(val) % 2 == 1:
+        val = '0' + val
+    return int(s, 16).to_bytes(length=len(val) // 2, byteorder='little')
+
+
+def tokenize(text):
+    kinds = []
+    values = []
+    for m in TOKENS_RE.finditer(text):
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'ID':
+            kind = get_id_kind(value)
+        elif kind == 'HEX':
+            value = hex_to_bytes(value)
+        elif kind == 'NUMBER':
+            value = int(value)
+        elif kind in ['DOUBLE_STRING', 'SINGLE_STRING']:
+            value = de_escape_string(value)
+        elif kind == 'END':
+            break
+        elif kind == 'ERROR':
+            line = text.count('\n', 0, m.start(kind)) + 1
+            raise SyntaxError(f"Illegal character '{value}' at line {line}")
+        kinds.append(kind)
+        values.append(value)
+    # end of input
+    kinds.append(None)
+    values.append(None)
+    return kinds, values
+
+
+class StreamParser:
+    def __init__(self, text):
+        self.kinds, self.values = tokenize(text)
+        self.idx = 0
+
+    def error(self, expected):
+        raise SyntaxError(f"expected {expected} but got {self.kinds[self.idx]} ('{self.values[self.idx]}'), "
+                          f"token #{self.idx}")
+
+    def peek(self, ahead=0):
+        return self.kinds[self.idx + ahead]
+
+    def expect(self, *kinds):
+        kind = self.kinds[self.idx]
+        if kind not in kinds:
+            self.error(' or '.join(kinds))
+        value = self.values[self.idx]
+        self.idx += 1
+        return value
+
+    def accept(self, kind):
+        if self.kinds[self.idx] == kind:
+            self.idx += 1
+            return True
+        return False
+
+    ####################
+
+    def parse(self):
+        result = []
+        while self.peek() is not None:
+            result.append(self.section())
+        if not result:
+            self.error('section')
+        return result
+
+    def section(self):
+        self.expect('DOT')
+        kind = self.peek()
+        if kind == 'CONFIG':
+            return self.expect('CONFIG'), self.rules()
+        elif kind == 'EXPORTS':
+            return self.expect('EXPORTS'), self.export_entries()
+        elif kind == 'CODE':
+            return self.expect('CODE'), self.code_entries()
+        elif kind == 'OBJECT':
+            return 'OBJECT', [self.object_name()] + self.object_entries(is_class=False)
+        elif kind == 'CLASS':
+            return 'CLASS', [self.class_name()] + self.object_entries(is_class=True)
+        elif kind == 'PRELOAD_TEXT':
+            return self.expect('PRELOAD_TEXT'), ()
+        elif kind == 'LOCAL_VARS':
+            return self.expect('LOCAL_VARS'), self.vars_list()
+        elif kind == 'RELOCATION':
+            name = self.expect('RELOCATION')
+            self.expect('NUM')
+            self.expect('OF')
+            self.expect('POINTERS')
+            self.expect('COLON')
+            return name, self.expect('NUMBER')
+        elif kind == 'STRINGS':
+            return self.expect('STRINGS'), self.string_entries()
+        self.error('section name')
+
+    def at_section_end(self):
+        return self.peek() in ['DOT', None]
+
+    ####################
+
+    def boolean(self):
+        return self.expect('TRUE', 'FALSE') == 'True'
+
+    def object_name(self):
+        kind = self.expect('OBJECT')
+        name = self.expect('ID', 'OPCODE')
+        self.expect('OF')
+        return kind, (name, self.expect('HEX'))
+
+    def class_name(self):
+        kind = self.expect('CLASS')
+        name = self.expect('ID', 'OPCODE', 'HEX')
+        self.expect('OF')
+        return kind, (name, self.expect('HEX'))
+
+    def string(self):
+        return self.expect('DOUBLE_STRING', 'SINGLE_STRING')[1:-1]
+
+    def val_id(self):
+        self.expect('LCURLY')
+        self.string()
+        self.expect('COLON')
+        val = self.string()
+        self.expect('COMMA')
+        self.string()
+        self.expect('COLON')
+        id = self.string()
+        self.expect('RCURLY')
+        return 'VAL_ID', val, id
+
+    def hex_or_val_id(self):
+        if self.peek() == 'LCURLY':
+            return self.val_id()
+        return self.expect('HEX')
+
+    ####################
+
+    def rules(self):
+        result = []
+        while True:
+            rule_id = self.expect('ID')
+            self.expect('EQUALS')
+            result.append((rule_id, self.boolean()))
+            if self.at_section_end():
+                return result
+
+    def export_entries(self):
+        result = []
+        while True:
+            kind = self.peek()
+            if kind == 'OBJECT':
+                result.append(self.object_name())
+            elif kind == 'CLASS':
+                result.append(self.class_name())
+            else:
+                result.append(self.expect('ID', 'NUMBER'))
+            if self.at_section_end():
+                return result
+
+    ####################
+
+    def code_entries(self):
+        result = []
+        while True:
+            if self.peek(1) == 'COLON':
+                label = self.code_label()
+                result.append((label, self.code_entry()))
+            else:
+                result.append(self.code_entry())
+            if self.at_section_end():
+                return result
+
+    def code_label(self):
+        start = self.idx
+        if self.peek() == 'ID' and self.peek(2) != 'COLON':
+            self.idx += 2
+        else:
+            self.expect('ID', 'NUMBER', 'OPCODE')
+            self.expect('COLON')
+            self.expect('COLON')
+            self.expect('NUMBER')
+            self.expect('COLON')
+        return 'LABEL', ''.join([str(s) for s in self.values[start:self.idx]])
+
+    def code_entry(self):
+        kind = self.peek()
+        if kind == 'OPCODE':
+            opcode = get_opcode(self.expect('OPCODE'))
+            operands = []
+            if self.peek() == 'HEX':
+                operands.append(self.expect('HEX'))
+                while len(operands) < 4 and self.accept('COMMA'):
+                    operands.append(self.expect('HEX'))
+            num_of_operands = OPCODES_INFO[opcode].num_of_operands
+            if len(operands) != num_of_operands:
+                self.error(f"{num_of_operands} operands for '{repr(opcode)}'")
+            return [opcode] + operands
+        elif kind == 'OPCODE_LABEL':
+            opcode = get_opcode(self.expect('OPCODE_LABEL'))
+            operand_kind = self.peek()
+            operand = self.expect('ID', 'OPCODE', 'HEX', 'NUMBER')
+            if operand_kind == 'ID' and self.accept('COMMA'):
+                return opcode, operand, self.expect('NUMBER')
+            return opcode, operand
+        elif kind == 'OPCODE_CALLK':
+            opcode = get_opcode(self.expect('OPCODE_CALLK'))
+            kernel = self.expect('ID')
+            self.expect('COMMA')
+            return opcode, kernel, self.expect('HEX')
+        self.error('opcode')
+
+    ####################
+
+    def object_entries(self, is_class):
+        result = []
+        while True:
+            kind = self.peek()
+            if kind == 'EXPORTED':
+                result.append((self.expect('EXPORTED'), True))
+            elif kind == 'FUNCTION':
+                self.expect('FUNCTION')
+                self.expect('AREA')
+                self.expect('OFFSET')
+                self.expect('COLON')
+                result.append(('function_offset', self.expect('HEX')))
+            elif kind == 'SELECTORS':
+                result.append(self.selectors(is_class))
+            elif kind == 'OVERRIDEN':
+                result.append(self.functions())
+            else:
+                self.error('object entry')
+            if self.at_section_end():
+                return result
+
+    def selectors(self, is_class):
+        name = self.expect('SELECTORS')
+        self.expect('LBRACKET')
+        num_of_items = self.expect('NUMBER')
+        self.expect('RBRACKET')
+        self.expect('COLON')
+        items = []
+        while True:
+            self.expect('LBRACKET')
+            if is_class:
+                selector_id = self.expect('HEX')
+            else:
+                self.expect('POUND')
+                selector_id = self.expect('NUMBER')
+            self.expect('RBRACKET')
+            self.expect('EQUALS')
+            items.append(('SELECTOR', selector_id, self.hex_or_val_id()))
+            if self.peek() != 'LBRACKET':
+                break
+        if len(items) != num_of_items:
+            self.error(f'{num_of_items} selectors')
+        return name, items
+
+    def functions(self):
+        self.expect('OVERRIDEN')
+        name = self.expect('FUNCTIONS')
+        self.expect('COLON')
+        num_of_items = self.expect('NUMBER')
+        items = []
+        while self.peek() == 'LBRACKET':
+            self.expect('LBRACKET')
+            selector_id = self.expect('HEX')
+            self.expect('RBRACKET')
+            self.expect('EQUALS')
+            start = self.idx
+            kind = self.peek()
+            self.expect('ID', 'NUMBER', 'OPCODE')
+            if kind != 'ID' or self.peek() == 'COLON':
+                self.expect('COLON')
+                self.expect('COLON')
+                self.expect('NUMBER')
+            items.append(('FUNCTION', selector_id, ''.join([str(s) for s in self.values[start:self.idx]])))
+        if len(items) != num_of_items:
+            self.error(f'{num_of_items} functions')
+        return name, items
+
+    ####################
+
+    def string_entries(self):
+        result = []
+        while True:
+            string_id = self.expect('ID')
+            self.expect('COLON')
+            result.append((string_id, self.string()))
+            if self.at_section_end():
+                return result
+
+    def vars_list(self):
+        result = [self.hex_or_val_id()]
+        while self.accept('COMMA'):
+            result.append(self.hex_or_val_id())
+        return result
+
+
+def parse(text):
+    return StreamParser(text).parse()
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
@@ -0,0 +1,84 @@
+# Structured result of disassembling a script (sections, instructions, strings and their usages, pointers), saved
+# next to its assembly (.sca) so other tools don't have to parse the .sca or disassemble the script again
+# it's valid only for the same script (.scr and .hep) it was made from, and the same MODEL_VERSION
+
+import hashlib
+import pickle
+from pathlib import Path
+
+from misc import get_string_id
+
+MODEL_VERSION = 1
+MODEL_SUFFIX = '.model'
+
+
+def get_script_hash(script_file):
+    script_file = Path(script_file)
+    h = hashlib.sha1(script_file.read_bytes())
+    heap_file = script_file.with_suffix('.hep')
+    if heap_file.exists():
+        h.update(heap_file.read_bytes())
+    return h.hexdigest()
+
+
+def get_usage(usage, sections):
+    # usage: as in script_disasm - the section, and the instruction / selector / local variable in it
+    result = {'section': sections[id(usage['obj'])]}
+    if 'instr' in usage:
+        result['offset'] = usage['instr'].offset
+    elif 'selector_i' in usage:
+        result['selector'] = usage['selector_i']
+    else:
+        result['local'] = usage['i'] if 'i' in usage else usage['index']
+    return result
+
+
+def build_model(objects):
+    sections = {id(obj): i for i, obj in enumerate(objects)}
+    model = {'sections': [], 'strings': [], 'pointers': {}}
+    for obj in objects:
+        # by name, as the sections may come from asm_lib.sci_section (a different module than sci_section)
+        kind = obj.kind.name
+        section = {'kind': kind, 'offset': obj.obj_offset}
+        if kind in ['OBJECT', 'CLASS']:
+            section['name'] = obj.get_id()
+        elif kind == 'CODE':
+            section['instructions'] = [(instr.offset, int(instr.opcode), instr.operands) for instr in obj.instructions]
+        elif kind == 'STRINGS':
+            # same fields as script_disasm.get_strings_table, and more
+            model['strings'] += [{'id': get_string_id(s), 'str': s['str'], 'special': s['special'],
+                                  'used': bool(s['usages']), 'offset': s['offset'],
+                                  'usages': [get_usage(u, sections) for u in s['usages']]}
+                                 for s in obj.strings]
+        elif kind == 'RELOCATION':
+            model['pointers'] = {pointer: get_usage(usage, sections) if usage else None
+                                 for pointer, usage in obj.pointers.items()}
+        model['sections'].append(section)
+    return model
+
+
+def get_model_file(asm_path, script_file):
+    return Path(asm_path) / (Path(script_file).stem + MODEL_SUFFIX)
+
+
+def save_model(asm_path, script_file, objects):
+    data = {'version': MODEL_VERSION, 'hash': get_script_hash(script_file), 'model': build_model(objects)}
+    get_model_file(asm_path, script_file).write_bytes(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_model(asm_path, script_file):
+    # None if there is no model, or it's outdated
+    try:
+        data = pickle.loads(get_model_file(asm_path, script_file).read_bytes())
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        return None
+    if data.get('version') != MODEL_VERSION or data.get('hash') != get_script_hash(script_file):
+        return None
+    return data['model']
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
@@ -0,0 +1,168 @@
+# Whole game classes/selectors database, used by the disassembler to name selectors across scripts
+# built in one pass over all the scripts (.scr) and vocab 997 (selector names), then cached in the target directory
+# https://wiki.scummvm.org/index.php?title=SCI/Specifications/SCI_virtual_machine/Introduction#Script_resources
+
+import json
+from pathlib import Path
+
+from misc import read_le, SIERRA_SCRIPT_HEADER, SIERRA_VOCAB_HEADER, SIERRA_HEAP_HEADER, \
+    SCRIPT_OBJECT_MAGIC_NUMBER, MAGIC_8, ENCODING_OUTPUT, CONFIG_WIDE_EXPORTS
+from sci_section import SectionKind
+
+GAME_DB_FILE = 'game_db.json'
+GAME_DB_VERSION = 1
+SELECTOR_NAMES_FILES = ['vocab.997', '997.voc']
+
+
+def load_selector_names(srcdir):
+    for name in SELECTOR_NAMES_FILES:
+        vocab_file = Path(srcdir) / name
+        if vocab_file.exists():
+            vocab = vocab_file.read_bytes()
+            assert vocab[:2] == SIERRA_VOCAB_HEADER
+            vocab = vocab[2:]
+            # max selector id, then a table of offsets, each pointing to a length and the name itself
+            names = []
+            for i in range(read_le(vocab, 0) + 1):
+                offset = read_le(vocab, 2 + i * 2)
+                length = read_le(vocab, offset)
+                names.append(vocab[offset + 2:offset + 2 + length].decode(ENCODING_OUTPUT))
+            return names
+    return []
+
+
+def read_strings(data, offset):
+    strings = {}
+    for s in data.split(b'\0'):
+        strings[offset] = s.decode(ENCODING_OUTPUT)
+        offset += len(s) + 1
+    return strings
+
+
+def scan_script(script_file):
+    # minimal parse of a script: its objects and classes (and their selectors), and the exported ones
+    in_script = Path(script_file).read_bytes()
+    assert in_script[:2] == SIERRA_SCRIPT_HEADER
+    in_script = in_script[2:]
+
+    heap_file = Path(script_file).with_suffix('.hep')
+    if heap_file.exists():
+        strings, objects, exports = scan_script_sci11(in_script, heap_file.read_bytes())
+    else:
+        strings, objects, exports = scan_script_sci0(in_script)
+
+    for obj in objects:
+        obj['name'] = strings.get(obj['name'], f"class_{obj['name']}")
+    exported = {exp: i for i, exp in enumerate(exports)}
+    return [obj for obj in objects if obj['kind'] == SectionKind.CLASS], \
+        [(exported[obj['offset']], obj['name']) for obj in objects if obj['offset'] in exported]
+
+
+def scan_script_sci0(in_script):
+    strings = {}
+    objects = []
+    exports = []
+    idx = 0
+    while read_le(in_script, idx) != 0:
+        kind = SectionKind(read_le(in_script, idx))
+        length = read_le(in_script, idx + 2)
+        start = idx + 4
+        if kind == SectionKind.STRINGS:
+            strings.update(read_strings(in_script[start:idx + length], start))
+        elif kind == SectionKind.EXPORTS:
+            width = 4 if CONFIG_WIDE_EXPORTS else 2
+            exports = [int.from_bytes(in_script[start + 2 + i * width:start + 2 + (i + 1) * width], byteorder='little')
+                       for i in range(read_le(in_script, start))]
+        elif kind in [SectionKind.OBJECT, SectionKind.CLASS]:
+            assert read_le(in_script, start) == SCRIPT_OBJECT_MAGIC_NUMBER
+            num_of_var_selectors = read_le(in_script, start + 6)
+            vals = [read_le(in_script, start + MAGIC_8 + i * 2) for i in range(num_of_var_selectors)]
+            obj = {'kind': kind, 'offset': start + MAGIC_8, 'species': vals[0], 'super': vals[1], 'name': vals[3]}
+            if kind == SectionKind.CLASS:
+                ids_start = start + MAGIC_8 + num_of_var_selectors * 2
+                obj['selectors'] = [read_le(in_script, ids_start + i * 2) for i in range(num_of_var_selectors)]
+            objects.append(obj)
+        idx += length
+    return strings, objects, exports
+
+
+def scan_script_sci11(in_script, heap):
+    # same as script_disasm.split_objects_sci11, but only the objects; offsets are relative to the heap
+    assert heap[:2] == SIERRA_HEAP_HEADER
+    heap = heap[2:]
+    exports = [read_le(in_script, 8 + i * 2) for i in range(read_le(in_script, 6))]
+
+    objects = []
+    idx = 4 + read_le(heap, 2) * 2
+    while read_le(heap, idx) == SCRIPT_OBJECT_MAGIC_NUMBER:
+        num_of_var_selectors = read_le(heap, idx + 2)
+        vals = [read_le(heap, idx + i * 2) for i in range(num_of_var_selectors)]
+        kind = SectionKind.CLASS if vals[7] & 0x8000 else SectionKind.OBJECT
+        obj = {'kind': kind, 'offset': idx, 'species': vals[5], 'super': vals[6], 'name': vals[8]}
+        if kind == SectionKind.CLASS:
+            obj['selectors'] = [read_le(in_script, vals[2] + i * 2) for i in range(num_of_var_selectors)]
+        objects.append(obj)
+        idx += num_of_var_selectors * 2
+    idx += 2
+    return read_strings(heap[idx:read_le(heap, 0)], idx), objects, exports
+
+
+class GameDatabase:
+    def __init__(self, srcdir, target):
+        srcdir = Path(srcdir)
+        script_files = sorted(srcdir.glob('*.scr'), key=lambda p: p.name.lower())
+        sources = {p.name: [p.stat().st_size, p.stat().st_mtime_ns] for p in script_files}
+        for name in SELECTOR_NAMES_FILES:
+            if (srcdir / name).exists():
+                sources[name] = [(srcdir / name).stat().st_size, (srcdir / name).stat().st_mtime_ns]
+
+        cache_file = Path(target) / GAME_DB_FILE
+        try:
+            cache = json.loads(cache_file.read_text())
+        except (FileNotFoundError, ValueError):
+            cache = {}
+        if cache.get('version') != GAME_DB_VERSION or cache.get('sources') != sources:
+            cache = {'version': GAME_DB_VERSION, 'sources': sources,
+                     'selectors': load_selector_names(srcdir), 'classes': [], 'exports': []}
+            for script_file in script_files:
+                if script_file.name.lower() == 'install.scr':
+                    continue
+                classes, exports = scan_script(script_file)
+                for cls in classes:
+                    cache['classes'].append([cls['species'], cls['name'], script_file.stem, cls['super'],
+                                             cls['selectors']])
+                for i, name in exports:
+                    cache['exports'].append([script_file.stem, i, name])
+            cache_file.write_text(json.dumps(cache, separators=(',', ':')))
+
+        self.selectors = cache['selectors']
+        # species -> {'name', 'script', 'super', 'selectors'}
+        self.classes = {species: {'name': name, 'script': script, 'super': super_species, 'selectors': selectors}
+                        for species, name, script, super_species, selectors in cache['classes']}
+        # (script, export index) -> object name
+        self.exports = {(script, i): name for script, i, name in cache['exports']}
+
+    def get_selector_name(self, selector_id):
+        if 0 <= selector_id < len(self.selectors):
+            return self.selectors[selector_id]
+        return None
+
+    def get_class_name(self, species):
+        try:
+            return self.classes[species]['name']
+        except (KeyError, TypeError):
+            return None
+
+    def get_var_selector_names(self, species):
+        # an object's variable selectors are its class's ones, in the same order
+        try:
+            return [self.get_selector_name(s) for s in self.classes[species]['selectors']]
+        except (KeyError, TypeError):
+            return []
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
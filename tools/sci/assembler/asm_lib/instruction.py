@@ -1,8 +1,11 @@
-from opcodes import SciOpcodes
-from misc import Kernels
+from opcodes import SciOpcodes, OPCODES_INFO
 
 
 class Instruction:
+    # there is an instance for every instruction of every script - so keep it small
+    __slots__ = ('str', 'label', 'exported', 'legal', 'offset', 'opcode', 'mode', 'operands', 'length',
+                 'operands_lens', 'extra', 'operands_width', 'obj')
+
     # TODO mark jump labels?
     def __init__(self, opcode, operands, offset, mode='disasm', label=None, kernels=None):
         self.str = None
@@ -12,25 +15,13 @@ class Instruction:
         self.offset = offset
         self.opcode = opcode
         self.mode = mode
+        info = OPCODES_INFO[opcode]
         if mode == 'asm':
             self.operands = operands
-            length_range = self.opcode.instruction_length_range()
-            if self.opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]:
-                self.length = length_range['max']
-                self.operands_lens = [self.length - 1]
-                self.extra = 0
-            elif self.opcode in [SciOpcodes.op_call]:
-                self.length = length_range['max']
-                self.operands_lens = [self.length - 2, 1]
-                self.extra = 0
-            elif self.opcode in [SciOpcodes.op_callk]:
-                self.length = length_range['min']
-                self.operands_lens = [self.length - 2, 1]
-                self.extra = 1
-            elif self.opcode.is_relative():
-                self.length = length_range['max']
-                self.operands_lens = [self.length - 1]
-                self.extra = 0
+            if info.asm_operands_lens is not None:
+                self.length = info.asm_length
+                self.operands_lens = info.asm_operands_lens
+                self.extra = info.asm_extra
             else:
                 self.length = 1
                 self.operands_lens = []
@@ -47,23 +38,23 @@ class Instruction:
                     else:
                         raise ValueError
 
-                assert length_range['min'] == self.length or self.length == length_range['max']
-                self.extra = length_range['max'] - self.length
+                assert info.min_length == self.length or self.length == info.max_length
+                self.extra = info.max_length - self.length
                 if self.extra > 1:
                     self.extra = 1
         elif mode == 'disasm':
             self.operands_width = [len(operands)]
             if self.opcode in [SciOpcodes.op_pushi, SciOpcodes.op_ldi, SciOpcodes.op_link]:
-                self.operands = int.from_bytes(operands, byteorder='little', signed=self.opcode.is_signed())
+                self.operands = int.from_bytes(operands, byteorder='little', signed=info.signed)
             elif self.opcode == SciOpcodes.op_call:
-                offset = int.from_bytes(operands[:-1], byteorder='little', signed=self.opcode.is_signed())
+                offset = int.from_bytes(operands[:-1], byteorder='little', signed=info.signed)
                 self.operands = [self.offset + len(operands) + 1 + offset, operands[-1]]
-            elif self.opcode.is_relative():
-                offset = int.from_bytes(operands, byteorder='little', signed=self.opcode.is_signed())
+            elif info.relative:
+                offset = int.from_bytes(operands, byteorder='little', signed=info.signed)
                 self.operands = self.offset + len(operands) + 1 + offset
             elif self.opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]:
                 # see comment at opcodes.py
-                self.operands = int.from_bytes(operands, byteorder='little', signed=self.opcode.is_signed())
+                self.operands = int.from_bytes(operands, byteorder='little', signed=info.signed)
             elif self.opcode in [SciOpcodes.op_callb, SciOpcodes.op_super]:
                 self.operands = ', '.join([hex(o) for o in operands])
             elif self.opcode == SciOpcodes.op_callk:
@@ -94,11 +85,11 @@ class Instruction:
                     self.operands = [int.from_bytes(operands[0:2], byteorder='little'),
                                      int.from_bytes(operands[2:4], byteorder='little'),]
                     self.operands_width = [2, 2]
-            elif self.opcode.num_of_operands() == 0:
+            elif info.num_of_operands == 0:
                 self.operands = ""
             elif self.opcode >= SciOpcodes.op_lag:
                 self.operands = int.from_bytes(operands[0:2], byteorder='little')
-            elif self.opcode.num_of_operands() == 1:
+            elif info.num_of_operands == 1:
                 self.operands = operands[0]
             else:
                 raise NotImplementedError
@@ -118,7 +109,7 @@ class Instruction:
 
     def str_dump(self):
         def operand_dump(operand, i=0):
-            if self.opcode.is_relative():
+            if OPCODES_INFO[self.opcode].relative:
                 return str(operand)
             elif isinstance(operand, str):
                 return operand
@@ -1,4 +1,3 @@
-import shutil
 from pathlib import Path
 
 MAGIC_8 = 8  # TODO why is it needed??
@@ -12,6 +11,9 @@ ENCODING_OUTPUT = 'windows-1255'  # TODO let user control this
 CONFIG_LOFSA_RELATIVE = False
 CONFIG_WIDE_EXPORTS = True
 
+# control chars and quotes, as written in the strings of the assembly
+STRING_ESCAPES = str.maketrans({'\n': r'\n', '\t': r'\t', '"': r'\"'})
+
 
 def read_le(l, idx):
     return l[idx] + l[idx + 1] * 256
@@ -39,7 +41,7 @@ def get_string_id(s):
 
 
 def escape_string(s):
-    return s.replace("\r\n", r"\n").replace("\n", r"\n").replace('\t', r'\t').replace('"', r'\"')
+    return s.replace("\r\n", "\n").translate(STRING_ESCAPES)
 
 
 def de_escape_string(s):
@@ -50,24 +52,22 @@ def get_scripts_directory():
     return Path(__file__).parent.resolve()
 
 
+def write_if_changed(path, data):
+    try:
+        if path.read_bytes() == data:
+            return
+    except FileNotFoundError:
+        pass
+    path.write_bytes(data)
+
+
 class Kernels:
-    def __init__(self, srcdir, target, mode):
-        if mode == 'disasm':
-            kernels_file = Path(srcdir) / '999.voc'
-            try:
-                kernels_b = kernels_file.read_bytes()
-                assert kernels_b[0:2] == SIERRA_VOCAB_HEADER
-                self.kernels = [k.decode() for k in kernels_b[2:].split(b'\0') if k]
-                (target / 'kernels.csv').write_text('\n'.join([f'{id}, {k}' for id, k in enumerate(self.kernels)]))
-            except FileNotFoundError:
-                # SQ6 doesn't have this file, copy from SQ1VGA
-                shutil.copyfile(get_scripts_directory() / 'kernels.csv', target / 'kernels.csv')
-        else:
-            kernels_file = Path(srcdir) / 'kernels.csv'
-            kernels_csv = kernels_file.read_text().splitlines()
-            self.kernels = [k.split(',')[1].strip() for k in kernels_csv]
-            (target / '999.voc').write_bytes(
-                SIERRA_VOCAB_HEADER + b'\0'.join([k.encode() for k in self.kernels]) + b'\0')
+    def __init__(self, kernels):
+        self.kernels = kernels
+        # same as kernels.index() - first kernel of each name
+        self.indexes = {}
+        for i, k in enumerate(kernels):
+            self.indexes.setdefault(k, i)
 
     def get_kernel(self, i):
         try:
@@ -77,11 +77,56 @@ class Kernels:
             return f'kernel_{i}'
 
     def get_index(self, kernel):
-        try:
-            return self.kernels.index(kernel)
-        except ValueError:
+        index = self.indexes.get(kernel)
+        if index is None:
             assert kernel.startswith('kernel_')
-            return int(kernel.replace('kernel_', ''))
+            index = int(kernel[len('kernel_'):])
+        return index
+
+    def to_csv(self):
+        return '\n'.join([f'{id}, {k}' for id, k in enumerate(self.kernels)]).encode()
+
+    def to_voc(self):
+        return SIERRA_VOCAB_HEADER + b'\0'.join([k.encode() for k in self.kernels]) + b'\0'
+
+
+# kernels tables loaded so far, by their source file; shared by the assembler and the disassembler
+kernels_registry = {}
+
+
+def get_registry_key(kernels_file):
+    stat = kernels_file.stat()
+    return kernels_file.resolve(), stat.st_mtime_ns, stat.st_size
+
+
+def get_kernels(srcdir, target, mode):
+    if mode == 'disasm':
+        kernels_file = Path(srcdir) / '999.voc'
+        if not kernels_file.exists():
+            # SQ6 doesn't have this file, use SQ1VGA's
+            kernels_file = get_scripts_directory() / 'kernels.csv'
+    else:
+        kernels_file = Path(srcdir) / 'kernels.csv'
+
+    key = get_registry_key(kernels_file)
+    if key not in kernels_registry:
+        if kernels_file.suffix == '.voc':
+            kernels_b = kernels_file.read_bytes()
+            assert kernels_b[0:2] == SIERRA_VOCAB_HEADER
+            kernels_registry[key] = Kernels([k.decode() for k in kernels_b[2:].split(b'\0') if k])
+        else:
+            kernels_csv = kernels_file.read_text().splitlines()
+            kernels_registry[key] = Kernels([k.split(',')[1].strip() for k in kernels_csv])
+    kernels = kernels_registry[key]
+
+    if mode == 'disasm':
+        write_if_changed(Path(target) / 'kernels.csv', kernels.to_csv())
+    else:
+        voc_file = Path(target) / '999.voc'
+        write_if_changed(voc_file, kernels.to_voc())
+        # so disassembling the target won't read it again
+        kernels_registry[get_registry_key(voc_file)] = kernels
+    return kernels
 
 
 if __name__ == '__main__':
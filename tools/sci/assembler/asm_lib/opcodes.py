@@ -1,4 +1,5 @@
 from enum import IntEnum, unique
+from typing import NamedTuple, Optional, Tuple
 
 from misc import CONFIG_LOFSA_RELATIVE
 
@@ -371,6 +372,82 @@ def instruction_length(opcode):
     return result
 
 
+class OpcodeInfo(NamedTuple):
+    min_length: int
+    max_length: int
+    relative: bool
+    signed: bool
+    num_of_operands: int
+    # the layout the assembler uses, when it doesn't depend on the operands themselves (otherwise: None)
+    asm_length: Optional[int]
+    asm_operands_lens: Optional[Tuple[int, ...]]
+    asm_extra: Optional[int]
+
+
+def get_opcode_info(opcode):
+    length_range = opcode.instruction_length_range()
+    if opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]:
+        asm_length = length_range['max']
+        asm_operands_lens = (asm_length - 1,)
+        asm_extra = 0
+    elif opcode == SciOpcodes.op_call:
+        asm_length = length_range['max']
+        asm_operands_lens = (asm_length - 2, 1)
+        asm_extra = 0
+    elif opcode == SciOpcodes.op_callk:
+        asm_length = length_range['min']
+        asm_operands_lens = (asm_length - 2, 1)
+        asm_extra = 1
+    elif opcode.is_relative():
+        asm_length = length_range['max']
+        asm_operands_lens = (asm_length - 1,)
+        asm_extra = 0
+    else:
+        asm_length = asm_operands_lens = asm_extra = None
+    return OpcodeInfo(min_length=length_range['min'],
+                      max_length=length_range['max'],
+                      relative=opcode.is_relative(),
+                      signed=opcode.is_signed(),
+                      num_of_operands=opcode.num_of_operands(),
+                      asm_length=asm_length,
+                      asm_operands_lens=asm_operands_lens,
+                      asm_extra=asm_extra)
+
+
+# computed once, instead of calling the (slow) SciOpcodes methods for every instruction
+OPCODES_INFO = {opcode: get_opcode_info(opcode) for opcode in SciOpcodes}
+
+
+class DecodeEntry(NamedTuple):
+    opcode: SciOpcodes
+    length: int  # including the opcode byte itself
+    operands_width: Tuple[int, ...]
+
+
+def get_decode_entry(byte):
+    if byte >> 1 not in [opcode.value for opcode in SciOpcodes]:
+        # dummy opcodes
+        return None
+    opcode = SciOpcodes(byte >> 1)
+    length = instruction_length(byte)
+    operands_length = length - 1
+    if opcode == SciOpcodes.op_callk:
+        operands_width = (operands_length - 1, 1)
+    elif opcode == SciOpcodes.op_calle:
+        operands_width = (1, 1, 1) if operands_length == 3 else (2, 2, 1)
+    elif opcode == SciOpcodes.op_lea:
+        operands_width = (1, 1) if operands_length == 2 else (2, 2)
+    elif opcode == SciOpcodes.op_call:
+        operands_width = (operands_length - 1, 1)
+    else:
+        operands_width = (operands_length,)
+    return DecodeEntry(opcode, length, operands_width)
+
+
+# raw opcode byte -> DecodeEntry (or None for the dummy opcodes), for the disassembler
+DECODE_TABLE = [get_decode_entry(byte) for byte in range(256)]
+
+
 if __name__ == '__main__':
     print("This script shouldn't be directly called")
     import sys
@@ -17,11 +17,14 @@ class SectionKind(Enum):
 
 
 class SciSection:
-    def __init__(self, obj_type, obj_offset, obj_length=None, obj_data=None):
+    def __init__(self, obj_type, obj_offset, obj_length=None, obj_data=None, heap_base=None):
         self.kind = SectionKind(obj_type)
         self.obj_offset = obj_offset
         self.length = obj_length
         self.data = obj_data
+        # SCI1.1 (.scr + .hep): the heap sections come after the script, so heap offsets are heap_base + offset
+        # (same as ScummVM). None for SCI0
+        self.heap_base = heap_base
         self.usages = []
         self.exported = False
         self.name = ""
@@ -30,8 +33,19 @@ class SciSection:
         self.unique_extension = ""
         if self.kind in [SectionKind.OBJECT, SectionKind.CLASS]:
             self.func_selector_offset = None
+            # pointers to the object point to its selectors
+            self.address = None
+            # indexes of the species, superClass and name selectors
+            self.species_i, self.super_i, self.name_i = 0, 1, 3
+            # from the whole game database, if available
+            self.super_name = None
+            self.var_selector_names = []
         elif self.kind == SectionKind.RELOCATION:
             self.pointers = []
+        elif self.kind == SectionKind.EXPORTS:
+            # SCI1.1: indexes of the exports which are heap pointers (objects), from the script's relocation table
+            # None for SCI0, whose exports are told apart by their value
+            self.heap_exports = None
 
     def __repr__(self):
         if self.kind in [SectionKind.OBJECT, SectionKind.CLASS]:
@@ -53,6 +67,8 @@ class SciSection:
 
     def str_dump(self):
         result = '.' + self.__repr__()
+        if self.kind in [SectionKind.OBJECT, SectionKind.CLASS] and self.super_name:
+            result += f'\t\t ; {self.super_name}'
         if self.exported:
             result += '\nExported'
         if self.kind in [SectionKind.OBJECT, SectionKind.CLASS]:
@@ -70,9 +86,13 @@ class SciSection:
                         result += f'\n  [{id}] = {hex(selector)}'
                     except TypeError:
                         result += f'\n  [{id}] = {selector}'
+                if i < len(self.var_selector_names) and self.var_selector_names[i]:
+                    result += f'\t\t ; {self.var_selector_names[i]}'
             result += f'\nOverriden functions: {len(self.func_selectors)}'
             for func in self.func_selectors:
-                result += f'\n  [{hex(func["id"])}]  = {func["label"]}   \t ; @{hex(func["pointer"])}'  # TODO add function name
+                result += f'\n  [{hex(func["id"])}]  = {func["label"]}   \t ; @{hex(func["pointer"])}'
+                if func.get('name'):
+                    result += f' {func["name"]}'
 
         elif self.kind == SectionKind.CODE:
             result += '\n' + '\n'.join([i.str_dump() for i in self.instructions])
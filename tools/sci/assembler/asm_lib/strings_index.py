@@ -0,0 +1,63 @@
+import bisect
+from collections import defaultdict, Counter
+
+
+def get_offset(s):
+    return s['offset']
+
+
+class Offsets:
+    # the offsets of a sorted list of strings, as a sequence for bisect (whose key argument needs Python 3.10),
+    # without copying them
+    def __init__(self, strings):
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, i):
+        return get_offset(self.strings[i])
+
+
+class StringsIndex:
+    # the strings of a script's STRINGS sections, sorted by offset
+    # strings which start in the middle of other strings ('_offset_' ones) are added while disassembling, to their
+    # sections and to the lookup by offset - but not to the strings searched by get_enclosing, so every substring is
+    # an offset into an original string (which script_patch relies on)
+    def __init__(self, sections):
+        # id(string) -> its section
+        self.sections = {id(s): section for section in sections for s in section.strings}
+        self.strings = sorted([s for section in sections for s in section.strings], key=get_offset)
+        self.offsets = [s['offset'] for s in self.strings]
+        self.by_offset = defaultdict(list)
+        for s in self.strings:
+            self.by_offset[s['offset']].append(s)
+        # id -> number of strings in its middle
+        self.substrings = Counter()
+
+    def get_matches(self, offset):
+        return self.by_offset.get(offset, [])
+
+    def get_enclosing(self, offset):
+        # the (last) original string which starts at offset or before it
+        if not self.strings or not self.offsets[0] <= offset <= self.offsets[-1]:
+            return None
+        return self.strings[bisect.bisect_right(self.offsets, offset) - 1]
+
+    def add_substring(self, parent, new_string):
+        section = self.sections[id(parent)]
+        self.sections[id(new_string)] = section
+        section.strings.insert(bisect.bisect_right(Offsets(section.strings), new_string['offset']), new_string)
+        self.by_offset[new_string['offset']].append(new_string)
+        self.substrings[str(parent['id'])] += 1
+
+    def is_unused(self, s):
+        # neither the string nor a part of it is used
+        return not s['usages'] and not self.substrings[str(s['id'])]
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
@@ -1,22 +1,33 @@
 import argparse
+import struct
 from pathlib import Path
 
-from asm_lib import asm_parser, asm_lexer
+from asm_lib import asm_parser, asm_lexer, asm_stream_parser
 
 from asm_lib.misc import *
 from asm_lib.instruction import Instruction
-from asm_lib.opcodes import SciOpcodes
+from asm_lib.opcodes import SciOpcodes, OPCODES_INFO
 from asm_lib.sci_section import SciSection, SectionKind
 
 HEADER_SIZE = 4
+# the whole script (and its pointers) should fit in one 64K segment
+MAX_SCRIPT_SIZE = 0x10000
+UINT16 = struct.Struct('<H')
+INT_STRUCTS = {
+    (1, False): struct.Struct('<B'),
+    (2, False): UINT16,
+    (4, False): struct.Struct('<I'),
+    (1, True): struct.Struct('<b'),
+    (2, True): struct.Struct('<h'),
+}
 
 
 def get_instructions(sections):
-    return sum([o.instructions for o in sections if o.kind == SectionKind.CODE], [])
+    return [i for o in sections if o.kind == SectionKind.CODE for i in o.instructions]
 
 
 def get_strings(sections):
-    return sum([o.strings for o in sections if o.kind == SectionKind.STRINGS], [])
+    return [s for o in sections if o.kind == SectionKind.STRINGS for s in o.strings]
 
 
 def add_pointer(sections, pointer):
@@ -25,6 +36,64 @@ def add_pointer(sections, pointer):
     pointers_section[0].pointers.append(pointer)
 
 
+def count_pointers(sections):
+    # should match the calls to add_pointer(..) of the second pass
+    result = 0
+    for section in sections:
+        if section.kind == SectionKind.CODE:
+            result += len([i for i in section.instructions if i.opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]])
+        elif section.kind in [SectionKind.OBJECT, SectionKind.CLASS]:
+            result += len([s for s in section.var_selectors if type(s[2]) is tuple])
+        elif section.kind == SectionKind.LOCAL_VARS:
+            result += len([v for v in section.local_vars if type(v) is tuple])
+    return result
+
+
+def unique_index(items):
+    # name -> value; a name which appears more than once is mapped to None, and would fail get_symbol(..)
+    result = {}
+    for name, value in items:
+        result[name] = None if name in result else value
+    return result
+
+
+def get_symbols(sections):
+    objects = [s for s in sections if s.kind in [SectionKind.OBJECT, SectionKind.CLASS]]
+    return {
+        'labels': unique_index((i.label, i.offset) for i in get_instructions(sections) if i.label),
+        'strings': unique_index((s['id'], s['offset']) for s in get_strings(sections)),
+        'objects': unique_index([(o.name, o) for o in objects] + [((o.kind, o.name), o) for o in objects]),
+    }
+
+
+def get_symbol(symbols, name):
+    value = symbols.get(name)
+    assert value is not None, f"'{name}' should be defined exactly once"  # TODO nice error message in all asserts
+    return value
+
+
+def section_position(section):
+    # position of the section in the output, after the script header
+    return len(SIERRA_SCRIPT_HEADER) + section.obj_offset
+
+
+def data_position(section):
+    return section_position(section) + HEADER_SIZE
+
+
+def end_position(section):
+    return section_position(section) + section.length
+
+
+def pack_int(output, pos, value, length, signed=False):
+    INT_STRUCTS[(length, signed)].pack_into(output, pos, value)
+
+
+def write_bytes(output, pos, b):
+    output[pos:pos + len(b)] = b
+    return pos + len(b)
+
+
 #####################################################
 
 
@@ -166,186 +235,169 @@ def first_class(section, offset):
 #########################################
 
 
-def second_exports(section, sections):
-    result = len(section.exports).to_bytes(length=2, byteorder='little')
+def second_exports(section, sections, symbols, output):
+    pos = data_position(section)
     length = 4 if CONFIG_WIDE_EXPORTS else 2
+    UINT16.pack_into(output, pos, len(section.exports))
+    pos += 2
     for export in section.exports:
         if export['kind'] in [SectionKind.OBJECT, SectionKind.CLASS]:
-            matches = [s for s in sections if s.kind == export['kind'] and s.name == export['id'][0]]
-            assert len(matches) == 1  # TODO nice error message in all asserts
-            value = matches[0].obj_offset + HEADER_SIZE + MAGIC_8
+            value = get_symbol(symbols['objects'], (export['kind'], export['id'][0])).obj_offset + HEADER_SIZE + MAGIC_8
         elif export['kind'] == 'ID' and export['id'].startswith('code_'):
-            instructions = get_instructions(sections)
-            matches = [i for i in instructions if i.label == export['id'] + ':']
-            assert len(matches) == 1
-            value = matches[0].offset
+            value = get_symbol(symbols['labels'], export['id'] + ':')
         elif export['kind'] == 'int':
             value = export['id']
         else:
             print(export)
             raise NotImplementedError
-        result += value.to_bytes(length=length, byteorder='little')
-    assert section.length == HEADER_SIZE + len(result)
-    return result
+        pack_int(output, pos, value, length)
+        pos += length
+    assert pos == end_position(section)
 
 
-def second_code(section, sections):
-    result = b''
+def second_code(section, sections, symbols, output):
+    pos = data_position(section)
     for instr in section.instructions:
-        opcode = (instr.opcode.value << 1) + instr.extra
-        result += opcode.to_bytes(length=1, byteorder='little')
-        # print(hex(instr.offset), instr, "\t", hex(result[-1]))
-        if instr.opcode.is_relative():
+        info = OPCODES_INFO[instr.opcode]
+        output[pos] = (instr.opcode.value << 1) + instr.extra
+        pos += 1
+        # print(hex(instr.offset), instr, "\t", hex(output[pos - 1]))
+        if info.relative:
             for i, operand in enumerate(instr.operands):
                 if isinstance(operand, str):
-                    instructions = get_instructions(sections)
-                    matches = [ins for ins in instructions if ins.label == operand + ':']
-                    assert len(matches) == 1
-                    value = matches[0].offset - (instr.offset + instr.length)
+                    value = get_symbol(symbols['labels'], operand + ':') - (instr.offset + instr.length)
                 elif i == 0:
                     value = operand - (instr.offset + instr.length)
                 else:
                     value = operand
-                result += value.to_bytes(length=instr.operands_lens[i], byteorder='little',
-                                         signed=instr.opcode.is_signed())
+                pack_int(output, pos, value, instr.operands_lens[i], signed=info.signed)
+                pos += instr.operands_lens[i]
         elif instr.opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]:
             assert len(instr.operands) == 1
             operand = instr.operands[0]
             assert type(operand) is str
             if operand.startswith('string_'):
-                strings = get_strings(sections)
-                matches = [s for s in strings if s['id'] == operand]
-                assert len(matches) == 1
-                value = matches[0]['offset']
-                result += value.to_bytes(length=2, byteorder='little', signed=instr.opcode.is_signed())
-                add_pointer(sections, instr.offset + 1)
+                value = get_symbol(symbols['strings'], operand)
+                pack_int(output, pos, value, 2, signed=info.signed)
             else:
-                matches = [s for s in sections if
-                           s.kind in [SectionKind.OBJECT, SectionKind.CLASS] and s.name == operand]
-                assert len(matches) == 1
-                value = matches[0].obj_offset + MAGIC_8 + 4  # TODO why +4 ??
-                result += value.to_bytes(length=instr.operands_lens[0], byteorder='little',
-                                         signed=instr.opcode.is_signed())
-                add_pointer(sections, instr.offset + 1)
+                value = get_symbol(symbols['objects'], operand).obj_offset + MAGIC_8 + 4  # TODO why +4 ??
+                pack_int(output, pos, value, instr.operands_lens[0], signed=info.signed)
+            add_pointer(sections, instr.offset + 1)
+            pos += instr.operands_lens[0]
         elif instr.opcode == SciOpcodes.op_callk:
             assert len(instr.operands) == 2
             kernel = instr.operands[0]
             assert type(kernel) is str
             value = kernels.get_index(kernel)
             assert value < 256  # if it fails, need to adapt instruction.py
-            result += value.to_bytes(length=instr.operands_lens[0], byteorder='little',
-                                     signed=instr.opcode.is_signed())
-            result += wordize(instr.operands[1], instr.operands_lens[1])
+            pack_int(output, pos, value, instr.operands_lens[0], signed=info.signed)
+            pos += instr.operands_lens[0]
+            pos = write_bytes(output, pos, wordize(instr.operands[1], instr.operands_lens[1]))
         else:
             for i, operand in enumerate(instr.operands):
-                result += wordize(operand, instr.operands_lens[i])
-    if len(result) % 2 == 1:
+                pos = write_bytes(output, pos, wordize(operand, instr.operands_lens[i]))
+    if (pos - data_position(section)) % 2 == 1:
         # sections should be 16-bit aligned
         # so, add some NOP
         # but there isn't such opcode...
         # so, adding '0' (seems that Sierra also did that); assuming it should never be reached anyway
-        result += b'\0'
-    assert section.length == HEADER_SIZE + len(result)
-    return result
+        pos += 1
+    assert pos == end_position(section)
 
 
-def second_class(section, sections):
-    return second_object(section, sections, is_class=True)
+def second_class(section, sections, symbols, output):
+    return second_object(section, sections, symbols, output, is_class=True)
 
 
-def second_object(section, sections, is_class=False):
-    result = b''
+def second_object(section, sections, symbols, output, is_class=False):
+    pos = data_position(section)
     offset = section.obj_offset
-    result += SCRIPT_OBJECT_MAGIC_NUMBER.to_bytes(length=2, byteorder='little')
-    result += b'\0\0'
-    result += wordize(section.func_selector_offset)
-    result += len(section.var_selectors).to_bytes(length=2, byteorder='little')
+    UINT16.pack_into(output, pos, SCRIPT_OBJECT_MAGIC_NUMBER)
+    pos += 4  # followed by 2 zero bytes
+    pos = write_bytes(output, pos, wordize(section.func_selector_offset))
+    UINT16.pack_into(output, pos, len(section.var_selectors))
+    pos += 2
     offset += 8
     for selector in section.var_selectors:
         # TODO handle names
         if type(selector[2]) is tuple:  # "VAL_ID"
             location = selector[2][2]
             if location.startswith('string_'):
-                strings = get_strings(sections)
-                matches = [s for s in strings if s['id'] == location]
-                assert len(matches) == 1
-                value = matches[0]['offset']
-                result += value.to_bytes(length=2, byteorder='little', signed=False)
+                UINT16.pack_into(output, pos, get_symbol(symbols['strings'], location))
+                pos += 2
                 add_pointer(sections, offset + 4)  # TODO why +4?
             else:
                 raise NotImplementedError
         else:
-            result += wordize(selector[2])
+            pos = write_bytes(output, pos, wordize(selector[2]))
         offset += 2
     if is_class:
         for selector in section.var_selectors:
-            result += wordize(selector[1])
+            pos = write_bytes(output, pos, wordize(selector[1]))
     # we dont care for offset from here on
-    result += len(section.func_selectors).to_bytes(length=2, byteorder='little')
+    UINT16.pack_into(output, pos, len(section.func_selectors))
+    pos += 2
     for func in section.func_selectors:
         # TODO handle names
-        result += wordize(func[1])
-    result += b'\0\0'
+        pos = write_bytes(output, pos, wordize(func[1]))
+    pos += 2  # zeroes
     for func in section.func_selectors:
-        instructions = get_instructions(sections)
-        matches = [ins for ins in instructions if ins.label == func[2] + ':']
-        assert len(matches) == 1
-        result += matches[0].offset.to_bytes(length=2, byteorder='little')
+        UINT16.pack_into(output, pos, get_symbol(symbols['labels'], func[2] + ':'))
+        pos += 2
 
-    assert section.length == HEADER_SIZE + len(result)
-    return result
+    assert pos == end_position(section)
 
 
-def second_preload_text(section, sections):
-    return b''
+def second_preload_text(section, sections, symbols, output):
+    pass
 
 
-def second_strings(section, sections):
-    result = b'\0'.join([s['str'].encode(ENCODING_OUTPUT) for s in section.strings])
-    if len(result) % 2 == 1:
-        result += b'\0'
+def second_strings(section, sections, symbols, output):
+    pos = data_position(section)
+    pos = write_bytes(output, pos, b'\0'.join([s['str'].encode(ENCODING_OUTPUT) for s in section.strings]))
+    if (pos - data_position(section)) % 2 == 1:
+        pos += 1
 
-    assert section.length == HEADER_SIZE + len(result)
-    return result
+    assert pos == end_position(section)
 
 
-def second_local_vars(section, sections):
-    result = b''
+def second_local_vars(section, sections, symbols, output):
+    pos = data_position(section)
     offset = section.obj_offset + HEADER_SIZE
     for var in section.local_vars:
         if type(var) is tuple:  # "VAL_ID"
             location = var[2]
             if location.startswith('string_'):
-                strings = get_strings(sections)
-                matches = [s for s in strings if s['id'] == location]
-                assert len(matches) == 1
-                value = matches[0]['offset']
-                result += value.to_bytes(length=2, byteorder='little', signed=False)
+                UINT16.pack_into(output, pos, get_symbol(symbols['strings'], location))
+                pos += 2
                 add_pointer(sections, offset)
             else:
                 raise NotImplementedError
         else:
-            result += wordize(var)
+            pos = write_bytes(output, pos, wordize(var))
         offset += 2
-    assert section.length == HEADER_SIZE + len(result)
-    return result
+    assert pos == end_position(section)
 
 
 def update_relocation(section, sections):
-    if section.pointers:
-        section.length = HEADER_SIZE + len(section.pointers) * 2 + 4  # 4: 2 for length, 2 for beginning zeroes
+    # the pointers themselves are only known after all other sections were written, but their number is known
+    num_of_pointers = count_pointers(sections)
+    if num_of_pointers:
+        section.length = HEADER_SIZE + num_of_pointers * 2 + 4  # 4: 2 for length, 2 for beginning zeroes
         return True
     else:
+        section.length = 0
         return False
 
 
-def second_relocation(section, sections):
-    result = b''
-    result += len(section.pointers).to_bytes(length=2, byteorder='little')
-    result += b'\0\0'  # see comment at script_asm.py, relocation_first
-    for pointer in section.pointers:
-        result += pointer.to_bytes(length=2, byteorder='little')
-    return result
+def second_relocation(section, sections, symbols, output):
+    assert len(section.pointers) == count_pointers(sections)
+    pos = data_position(section)
+    UINT16.pack_into(output, pos, len(section.pointers))
+    pos += 4  # see comment at script_asm.py, relocation_first, for the 2 zero bytes
+    struct.pack_into(f'<{len(section.pointers)}H', output, pos, *section.pointers)
+    pos += len(section.pointers) * 2
+    assert pos == end_position(section)
 
 
 #########################################
@@ -366,43 +418,94 @@ def first_pass(tree):
 
 
 def second_pass(sections):
-    result = SIERRA_SCRIPT_HEADER
+    # all the sections offsets are already known from the first pass (the relocation section is the last one),
+    # so the whole script is written into one buffer
+    relocation = sections[-1]
+    assert relocation.kind == SectionKind.RELOCATION
+    has_relocation = update_relocation(relocation, sections)
+    output = bytearray(end_position(relocation) + 2)  # 2: the ending zeroes
+    output[:len(SIERRA_SCRIPT_HEADER)] = SIERRA_SCRIPT_HEADER
+    symbols = get_symbols(sections)
     for section in sections:
-        try:
-            ok = True
-            if section.kind == SectionKind.RELOCATION:
-                ok = update_relocation(section, sections)
-            if ok:
-                handler = globals()[f'second_{section.kind.name.lower()}']
-                result += section.kind.value.to_bytes(length=2, byteorder='little')
-                result += section.length.to_bytes(length=2, byteorder='little')
-                result += handler(section, sections)
-        except KeyError:
+        if section.kind == SectionKind.RELOCATION and not has_relocation:
+            continue
+        handler = globals().get(f'second_{section.kind.name.lower()}')
+        if handler:
+            UINT16.pack_into(output, section_position(section), section.kind.value)
+            UINT16.pack_into(output, section_position(section) + 2, section.length)
+            handler(section, sections, symbols, output)
+        else:
             print("Unhandled", section.kind)
-            result += b'\xCC' * section.length
-    result += b'\0\0'
-    return result
+            output[section_position(section):end_position(section)] = b'\xCC' * section.length
+    return output
+
+
+def parse(text):
+    try:
+        return asm_stream_parser.parse(text)
+    except SyntaxError as e:
+        # the PLY parser is slower, but gives detailed error messages (and recovers from some errors)
+        print(f"Note: falling back to PLY parser ({e})")
+        asm_lexer.start()
+        return asm_parser.parser.parse(text)
 
 
 def asm(p):
-    asm_lexer.start()
     text = p.read_text(encoding=ENCODING_INPUT)
-    tree = asm_parser.parser.parse(text)
+    tree = parse(text)
     sections = first_pass(tree)
     result = second_pass(sections)
     return result
 
 
+def analyze(text):
+    # the layout of the assembled script, without assembling it (the first pass is enough)
+    sections = first_pass(parse(text))
+    relocation = sections[-1]
+    update_relocation(relocation, sections)
+    size = end_position(relocation) + 2
+    return {
+        'size': size,
+        'strings': sum(s.length for s in sections if s.kind == SectionKind.STRINGS),
+        'headroom': MAX_SCRIPT_SIZE - size,
+        'sections': [(s.kind.name, s.obj_offset, s.length) for s in sections if s.length],
+    }
+
+
+def print_analysis(name, analysis, verbose=False):
+    print(f"{name}: {analysis['size']} bytes, strings: {analysis['strings']} bytes, "
+          f"headroom: {analysis['headroom']} bytes")
+    if verbose:
+        for kind, offset, length in analysis['sections']:
+            print(f"\t{kind:<12} offset: {hex(offset):<8} size: {length}")
+    if analysis['headroom'] < 0:
+        print(f"ERROR: {name} is bigger than {MAX_SCRIPT_SIZE} bytes")
+
+
+def get_asm_files(src):
+    if Path(src).is_dir():
+        return Path(src).glob('*.sca')
+    else:
+        return [Path(src)]
+
+
+def analyze_all(src, verbose=False):
+    # returns the names of the scripts that are too big
+    too_big = []
+    for p in get_asm_files(src):
+        analysis = analyze(p.read_text(encoding=ENCODING_INPUT))
+        print_analysis(p.stem, analysis, verbose)
+        if analysis['headroom'] < 0:
+            too_big.append(p.stem)
+    return too_big
+
+
 def asm_all(src, compiledir):
     compile_path = Path(compiledir)
     compile_path.mkdir(exist_ok=True)
     global kernels
-    kernels = Kernels(src, compile_path, mode='asm')
-    if Path(src).is_dir():
-        asm_files = Path(src).glob('*.sca')
-    else:
-        asm_files = [Path(src)]
-    for p in asm_files:
+    kernels = get_kernels(src, compile_path, mode='asm')
+    for p in get_asm_files(src):
         out = compile_path / f'{p.stem}.scr'
         print("--------")
         print(f'Assembling {p} to {out}')
@@ -414,7 +517,15 @@ if __name__ == "__main__":
     arg_parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
                                          description=f"Sierra 'SCRIPT' assembler - WIP", )
     arg_parser.add_argument("src", help="assmebly (.sca) file or directory to read the assembly (.sca) files")
-    arg_parser.add_argument("compiledir", help="directory to write the compiled scripts (.scr, maybe also .hep) files")
+    arg_parser.add_argument("compiledir", nargs='?',
+                            help="directory to write the compiled scripts (.scr, maybe also .hep) files")
+    arg_parser.add_argument("--analyze", "-a", action='store_true',
+                            help="only report the sections' offsets and sizes, and the scripts' headroom")
     args = arg_parser.parse_args()
 
-    asm_all(args.src, args.compiledir)
+    if args.analyze:
+        analyze_all(args.src, verbose=True)
+    else:
+        if args.compiledir is None:
+            arg_parser.error("compiledir is required (unless --analyze)")
+        asm_all(args.src, args.compiledir)
@@ -2,7 +2,7 @@
 
 # TODO other generations:
 # said/synonym
-# .hep
+# SCI3 (SCI1.1 - SCI2.1 .scr + .hep are supported)
 
 # https://wiki.scummvm.org/index.php?title=SCI/Specifications/SCI_virtual_machine/Introduction#Script_resources
 
@@ -13,12 +13,29 @@
 # "C:\Zvika\ScummVM-dev\HebrewAdventure\sq3\PATCHES\script.001"
 
 import argparse
-import os
+import csv
+import json
+from collections import Counter
 
-from asm_lib.opcodes import SciOpcodes, instruction_length
+from asm_lib.opcodes import SciOpcodes, OPCODES_INFO, DECODE_TABLE
 from asm_lib.instruction import Instruction
 from asm_lib.misc import *
 from asm_lib.sci_section import SciSection, SectionKind
+from asm_lib.game_db import GameDatabase
+from asm_lib.strings_index import StringsIndex
+from asm_lib.disasm_model import save_model
+
+# whole game classes/selectors database; without it selectors are left unnamed
+game_db = None
+# the current script's strings (see disasm_objects)
+strings_index = None
+
+
+def get_pointer_value(obj, value):
+    # SCI1.1 pointers are relative to the heap
+    if obj.heap_base is not None and isinstance(value, int):
+        return obj.heap_base + value
+    return value
 
 
 def get_pointers(objects):
@@ -52,11 +69,12 @@ def code_first(obj):
     obj.instructions = []
     idx = 0
     while idx < len(code):
-        opcode = SciOpcodes(code[idx] >> 1)
-        num_of_operands = instruction_length(code[idx]) - 1
-        operands = code[idx + 1:idx + 1 + num_of_operands]
-        obj.instructions.append(Instruction(opcode, operands, obj.obj_offset + idx, kernels=kernels))
-        idx += instruction_length(code[idx])
+        entry = DECODE_TABLE[code[idx]]
+        if entry is None:
+            raise ValueError(f"Illegal opcode {hex(code[idx])} at {hex(obj.obj_offset + idx)}")
+        operands = code[idx + 1:idx + entry.length]
+        obj.instructions.append(Instruction(entry.opcode, operands, obj.obj_offset + idx, kernels=kernels))
+        idx += entry.length
 
 
 def exports_first(obj):
@@ -65,12 +83,16 @@ def exports_first(obj):
     num_of_exports = read_le(obj.data, idx)
     idx += 2
     for i in range(num_of_exports):
-        length = 4 if CONFIG_WIDE_EXPORTS else 2
+        length = 4 if CONFIG_WIDE_EXPORTS and obj.heap_base is None else 2
         obj.exports.append(int.from_bytes(obj.data[idx:idx + length], byteorder='little', signed=False))
         idx += length
 
 
 def object_first(obj):
+    if obj.heap_base is not None:
+        object_first_sci11(obj)
+        return
+    obj.address = obj.obj_offset + MAGIC_8
     idx = 0
     assert read_le(obj.data, idx) == SCRIPT_OBJECT_MAGIC_NUMBER
     idx += 2
@@ -89,10 +111,9 @@ def object_first(obj):
 
     obj.species = obj.var_selector_vals[0]
     obj.superClass = obj.var_selector_vals[1]
-    obj.name = obj.var_selector_vals[3]
+    set_object_name(obj, obj.var_selector_vals[3])
 
     if obj.kind == SectionKind.CLASS:
-        # TODO translate selector IDs to names, from vocab.997
         obj.var_selector_ids = []
         for i in range(num_of_var_selectors):
             obj.var_selector_ids.append(read_le(obj.data, idx))
@@ -126,10 +147,39 @@ def object_first(obj):
     assert idx == len(obj.data)
 
 
+def object_first_sci11(obj):
+    # the object itself is in the heap, its selectors' ids and functions are in the script
+    obj.address = obj.obj_offset
+    obj.var_selector_vals = [read_le(obj.data, idx) for idx in range(0, len(obj.data), 2)]
+    assert obj.var_selector_vals[0] == SCRIPT_OBJECT_MAGIC_NUMBER
+    assert obj.var_selector_vals[1] == len(obj.var_selector_vals)
+    obj.species_i, obj.super_i, obj.name_i = 5, 6, 8
+    obj.species = obj.var_selector_vals[obj.species_i]
+    obj.superClass = obj.var_selector_vals[obj.super_i]
+    obj.name = obj.var_selector_vals[obj.name_i]
+
+    if obj.kind == SectionKind.CLASS:
+        prop_dict = obj.var_selector_vals[2]
+        obj.var_selector_ids = [read_le(obj.script, prop_dict + i * 2) for i in range(len(obj.var_selector_vals))]
+        obj.var_selectors = dict(zip(obj.var_selector_ids, obj.var_selector_vals))
+
+    obj.func_selector_offset = obj.var_selector_vals[3]
+    obj.num_of_func_selectors = read_le(obj.script, obj.func_selector_offset)
+    obj.func_selectors = []
+    for i in range(obj.num_of_func_selectors):
+        idx = obj.func_selector_offset + 2 + i * 4
+        obj.func_selectors.append({'id': read_le(obj.script, idx), 'pointer': read_le(obj.script, idx + 2)})
+
+
 def relocation_first(obj):
     idx = 0
     num_of_pointers = read_le(obj.data, idx)
     idx += 2
+    if obj.heap_base is not None:
+        # SCI1.1 heap relocation table: offsets in the heap of pointers (of local variables and objects' selectors)
+        obj.pointers = {obj.heap_base + read_le(obj.data, idx + i * 2): False for i in range(num_of_pointers)}
+        assert idx + num_of_pointers * 2 == len(obj.data)
+        return
     # these two zeroes don't appear in the Wiki, but they are there in all of SQ1VGA scripts
     assert read_le(obj.data, idx) == 0
     idx += 2
@@ -163,94 +213,99 @@ def local_vars_first(obj):
 
 # used also for third pass
 def object_second(obj, objects, third_pass):
-    # TODO work will all files, have all classes, and then match selectors to ids. now it's very partial and therefore pointless
     pointers = get_pointers(objects)
-    strings = sum([o.strings for o in objects if o.kind == SectionKind.STRINGS], [])
     for i, selector in enumerate(obj.var_selector_vals):
-        matches = [s for s in strings if s['offset'] == selector]
-        pointer = obj.obj_offset + MAGIC_8 + i * 2
+        pointer = obj.address + i * 2
         if pointer in pointers and not pointers[pointer]:
+            selector = get_pointer_value(obj, selector)
+            matches = strings_index.get_matches(selector)
             if matches:
                 assert len(matches) == 1
                 matches[0]['usages'].append({'obj': obj, 'selector_i': i})
-                if i <= 3:
+                if i <= obj.name_i:
                     matches[0]['special'] = True
                 obj.var_selector_vals[i] = {'val': matches[0]['str'], 'id': get_string_id(matches[0])}
                 pointers[pointer] = {'obj': obj, 'selector_i': i, 'val': obj.var_selector_vals[i]}
             elif isinstance(selector, int) and third_pass:
-                new_string = string_match_not_on_start(objects, strings, pointers, selector, pointer,
+                new_string = string_match_not_on_start(pointers, selector, pointer,
                                                        {'obj': obj, 'selector_i': i})
                 if new_string:
-                    if i <= 3:
+                    if i <= obj.name_i:
                         new_string['special'] = True
                     obj.var_selector_vals[i] = {'val': new_string['str'], 'id': get_string_id(new_string)}
                     pointers[pointer] = {'obj': obj, 'selector_i': i, 'val': obj.var_selector_vals[i]}
 
     # update strings
-    obj.species = obj.var_selector_vals[0]
-    obj.superClass = obj.var_selector_vals[1]
+    obj.species = obj.var_selector_vals[obj.species_i]
+    obj.superClass = obj.var_selector_vals[obj.super_i]
     try:
-        obj.name = obj.var_selector_vals[3]['val']
+        set_object_name(obj, obj.var_selector_vals[obj.name_i]['val'])
     except TypeError:
         if third_pass:
-            obj.name = f"class_{obj.name}"
+            set_object_name(obj, f"class_{obj.name}")
             print(f"Warning: unnamed object ({obj})")
     if third_pass:
         if obj.unique_extension:
-            obj.name += obj.unique_extension
+            set_object_name(obj, obj.name + obj.unique_extension)
 
     if third_pass:
         instructions = sum([o.instructions for o in objects if o.kind == SectionKind.CODE], [])
         for selector in obj.func_selectors:
-            # TODO replace selector['id'] with name from selector table (vocab.997)
             matches = [i for i in instructions if i.offset == selector['pointer']]
             # maybe the assertion is not accurate (in case there's a 'jmp' or 'bnt', etc. for the start of function)
             # however, it passed fine through all of SQ1VGA
             assert len(matches) == 1
 
-            uniqify_name(obj, objects)
+            uniqify_name(obj)
             assert matches[0].label is None
             matches[0].label = f'{obj.sanitize(str(obj.name))}::{selector["id"]}'
             selector['label'] = matches[0].label
 
 
-def string_match_not_on_start(objects, strings, pointers, str_offset, pointer, usage_dict):
-    if strings[0]['offset'] <= str_offset <= strings[-1]['offset']:
-        match = [s for s in strings if s['offset'] <= str_offset][-1]
+def string_match_not_on_start(pointers, str_offset, pointer, usage_dict):
+    match = strings_index.get_enclosing(str_offset)
+    if match is not None:
         assert str_offset >= match['offset']
         assert str_offset <= match['offset'] + len(match['str'])
         delta = str_offset - match['offset']
-        strings_obj = [o for o in objects if o.kind == SectionKind.STRINGS][0]
         new_string = {'offset': str_offset,
                       'str': match['str'][delta:],
                       'id': f"{match['id']}_offset_{delta}",
                       'usages': [usage_dict],  # {'obj': obj, 'instr': instr}
                       'special': False,
                       }
-        strings_obj.strings.append(new_string)
-        strings_obj.strings = sorted(strings_obj.strings, key=lambda s: s['offset'])
+        strings_index.add_substring(match, new_string)
         pointers[pointer] = usage_dict
         return new_string
     else:
         return None
 
 
-def uniqify_name(instance, objects):
-    matches = [o for o in objects if
-               o.kind in [SectionKind.OBJECT, SectionKind.CLASS] and o.name == instance.name]
-    assert matches
-    if len(matches) > 1:
+def set_object_name(obj, name):
+    # keeps count of the objects of each name, for uniqify_name
+    set_object_name.names[obj.name] -= 1
+    set_object_name.names[name] += 1
+    obj.name = name
+
+
+def uniqify_name(instance):
+    assert set_object_name.names[instance.name] > 0
+    if set_object_name.names[instance.name] > 1:
         instance.unique_extension += "_u"
-        instance.name = f"{instance.name}_u"
+        set_object_name(instance, f"{instance.name}_u")
 
 
 def code_third(obj, objects):
     pointers = get_pointers(objects)
-    strings = sum([o.strings for o in objects if o.kind == SectionKind.STRINGS], [])
+    if obj.heap_base is not None:
+        # SCI1.1 lofsa/lofss are always pointers to the heap (without relocation)
+        for instr in obj.instructions:
+            if instr.opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]:
+                pointers.setdefault(instr.offset + 1, False)
     all_instructions = sum([o.instructions for o in objects if o.kind == SectionKind.CODE], [])
 
     for i, instr in enumerate(obj.instructions):
-        if instr.opcode.is_relative():
+        if OPCODES_INFO[instr.opcode].relative:
             try:
                 offset = instr.operands[0]
             except TypeError:
@@ -266,7 +321,8 @@ def code_third(obj, objects):
 
     for i, instr in enumerate(obj.instructions):
         if instr.offset + 1 in pointers:
-            matches = [s for s in strings if s['offset'] == instr.operands]
+            value = get_pointer_value(obj, instr.operands)
+            matches = strings_index.get_matches(value)
             if matches:
                 assert len(matches) == 1
                 pointers[instr.offset + 1] = {'obj': obj, 'instr': instr}
@@ -274,18 +330,21 @@ def code_third(obj, objects):
                 instr.operands = get_string_id(matches[0])
                 instr.str = matches[0]['str']
             else:
-                new_string = string_match_not_on_start(objects, strings, pointers, instr.operands, instr.offset + 1,
+                new_string = string_match_not_on_start(pointers, value, instr.offset + 1,
                                                        {'obj': obj, 'instr': instr})
                 if new_string is not None:
                     instr.operands = get_string_id(new_string)
                     instr.str = new_string['str']
 
     for i, instr in enumerate(obj.instructions):
+        value = instr.operands
+        if instr.offset + 1 in pointers:
+            value = get_pointer_value(obj, value)
         matches = [o for o in objects if
-                   o.kind in [SectionKind.OBJECT, SectionKind.CLASS] and instr.operands == o.obj_offset + MAGIC_8]
+                   o.kind in [SectionKind.OBJECT, SectionKind.CLASS] and value == o.address]
         if matches:
             assert len(matches) == 1
-            uniqify_name(matches[0], objects)
+            uniqify_name(matches[0])
             if instr.offset + 1 in pointers:
                 pointers[instr.offset + 1] = {'obj': obj, 'instr': instr}
                 matches[0].usages.append({'obj': obj, 'instr': instr})
@@ -295,11 +354,10 @@ def code_third(obj, objects):
 
 def local_vars_third(obj, objects):
     pointers = get_pointers(objects)
-    strings = sum([o.strings for o in objects if o.kind == SectionKind.STRINGS], [])
     for i, var in enumerate(obj.local_vars):
         pointer = obj.obj_offset + i * 2
         if pointer in pointers:
-            matches = [s for s in strings if s['offset'] == var]
+            matches = strings_index.get_matches(get_pointer_value(obj, var))
             if matches:
                 assert len(matches) == 1
                 matches[0]['usages'].append({'obj': obj, 'var': var, 'i': i})
@@ -307,7 +365,7 @@ def local_vars_third(obj, objects):
                 pointers[pointer] = {'obj': obj, 'index': i, 'var': obj.local_vars[i]}
             # TODO do we need inaccuate string match for local vars?
             # else:
-            #     new_string = string_match_not_on_start(objects, strings, pointers, instr.operands, instr.offset + 1,
+            #     new_string = string_match_not_on_start(pointers, instr.operands, instr.offset + 1,
             #                                            {'obj': obj, 'instr': instr})
             #     if new_string is not None:
             #         instr.operands = get_string_id(new_string)
@@ -332,8 +390,7 @@ def local_vars_third(obj, objects):
 
 def strings_fourth(obj, objects):
     for s in obj.strings:
-        if len(s['usages']) == 0 and s['str'] and \
-                len([str(s1['id']) for s1 in obj.strings if str(s1['id']).startswith(str(s['id']) + "_offset_")]) == 0:
+        if s['str'] and strings_index.is_unused(s):
             print('Warning, unused string: ', end='')
             print(s)
 
@@ -341,8 +398,11 @@ def strings_fourth(obj, objects):
 def exports_fourth(obj, objects):
     for i, exp in enumerate(obj.exports):
         if exp != 0:
-            instructions = sum([o.instructions for o in objects if o.kind == SectionKind.CODE], [])
-            matches = [inst for inst in instructions if inst.offset == exp]
+            matches = []
+            if obj.heap_exports is None or i not in obj.heap_exports:
+                instructions = sum([o.instructions for o in objects if o.kind == SectionKind.CODE], [])
+                matches = [inst for inst in instructions if inst.offset == exp]
+                assert matches or obj.heap_exports is None, exp
             if matches:
                 assert len(matches) == 1
                 matches[0].exported = True
@@ -350,12 +410,26 @@ def exports_fourth(obj, objects):
                 obj.exports[i] = matches[0]
             else:
                 matches = [o for o in objects if
-                           o.kind in [SectionKind.OBJECT, SectionKind.CLASS] and exp == o.obj_offset + MAGIC_8]
+                           o.kind in [SectionKind.OBJECT, SectionKind.CLASS] and
+                           get_pointer_value(obj, exp) == o.address]
                 assert len(matches) == 1
                 matches[0].exported = True
                 obj.exports[i] = matches[0]
 
 
+def object_fourth(obj, objects):
+    # names from the whole game database - selectors of objects are the selectors of their class
+    if game_db is None:
+        return
+    obj.super_name = game_db.get_class_name(obj.superClass)
+    if obj.kind == SectionKind.CLASS:
+        obj.var_selector_names = [game_db.get_selector_name(i) for i in obj.var_selector_ids]
+    else:
+        obj.var_selector_names = game_db.get_var_selector_names(obj.superClass)
+    for selector in obj.func_selectors:
+        selector['name'] = game_db.get_selector_name(selector['id'])
+
+
 def relocation_fourth(obj, objects):
     unused = 0
     for p, used in obj.pointers.items():
@@ -383,6 +457,10 @@ def split_objects(orig_script_file):
     assert in_script[:2] == SIERRA_SCRIPT_HEADER
     in_script = in_script[2:]
 
+    heap_file = Path(orig_script_file).with_suffix('.hep')
+    if heap_file.exists():
+        return split_objects_sci11(in_script, heap_file.read_bytes())
+
     # divide script file to objects
     objects = []
     idx = 0
@@ -397,45 +475,68 @@ def split_objects(orig_script_file):
         objects.append(SciSection(obj_type, idx + 4, obj_length, obj_data))
         idx += obj_length
 
-    if False:  # start of work on SCI2
-        heap_file = os.path.splitext(orig_script_file)[0] + '.hep'
-        heap = Path(heap_file).read_bytes()
-        assert heap[:2] == SIERRA_HEAP_HEADER
-        heap = heap[2:]
-
-        in_script += heap
-
-        endOfStringOffset = read_le(heap, 0)
-        objectStartOffset = read_le(heap, 2) * 2 + 4
-
-        assert endOfStringOffset <= len(heap)
-        assert objectStartOffset <= len(heap)
-
-        # divide script file to objects
-        objects = []
-        hep_idx = objectStartOffset
-        scr_idx = 0
-        while True:
-            obj_type = read_le(heap, hep_idx)
-            hep_idx += 2
-            print("obj_type", hex(obj_type))
-            if obj_type != SCRIPT_OBJECT_MAGIC_NUMBER:
-                break
-            offset = scr_idx - in_script[scr_idx] - 2  # TODO not good
-            num_properties = read_le(heap, hep_idx)
-            hep_idx += 2
-
-            script_num = read_le(heap, hep_idx + 6)
-            print(offset, num_properties, script_num)
-
-            # obj_length = read_le(in_script, idx + 2)
-            # assert obj_length > 0
-            # obj_data = in_script[idx + 4:idx + obj_length]
-            # obj = [obj_type, idx + 4, obj_length, obj_data]
-            # objects.append(obj)
-            # idx += obj_length
-
-        print('heap', heap)
+    return objects
+
+
+def split_objects_sci11(in_script, heap):
+    # SCI1.1: the script (.scr) has the exports, the objects' selectors ids and functions tables and the code
+    # the heap (.hep) has the local variables, the objects, the strings and the relocation table
+    # the heap is loaded after the script, so heap offsets are shifted by heap_base (like in ScummVM)
+    # divided to the same sections as SCI0 scripts, so all the passes work on both
+    assert heap[:2] == SIERRA_HEAP_HEADER
+    heap = heap[2:]
+    heap_base = len(in_script)
+
+    objects = []
+    script_relocation_offset = read_le(in_script, 0)
+    num_of_exports = read_le(in_script, 6)
+    code_start = 8 + num_of_exports * 2
+    exports = SciSection(SectionKind.EXPORTS.value, 6, code_start - 6, in_script[6:code_start], heap_base)
+    # the script's relocation table: the offsets (in the script) of its heap pointers - the exports of objects
+    relocated = set()
+    if 0 < script_relocation_offset < len(in_script):
+        num_of_relocations = read_le(in_script, script_relocation_offset)
+        relocated = {read_le(in_script, script_relocation_offset + 2 + i * 2) for i in range(num_of_relocations)}
+    exports.heap_exports = {i for i in range(num_of_exports) if 8 + i * 2 in relocated}
+    objects.append(exports)
+
+    num_of_local_vars = read_le(heap, 2)
+    if num_of_local_vars:
+        objects.append(SciSection(SectionKind.LOCAL_VARS.value, heap_base + 4, num_of_local_vars * 2,
+                                  heap[4:4 + num_of_local_vars * 2], heap_base))
+
+    hep_idx = 4 + num_of_local_vars * 2
+    while read_le(heap, hep_idx) == SCRIPT_OBJECT_MAGIC_NUMBER:
+        obj_length = read_le(heap, hep_idx + 2) * 2
+        # '-info-' selector
+        kind = SectionKind.CLASS if read_le(heap, hep_idx + 14) & 0x8000 else SectionKind.OBJECT
+        obj = SciSection(kind.value, heap_base + hep_idx, obj_length, heap[hep_idx:hep_idx + obj_length], heap_base)
+        obj.script = in_script
+        objects.append(obj)
+
+        # code comes after the selectors ids and functions tables
+        num_of_funcs = read_le(in_script, read_le(heap, hep_idx + 6))
+        code_start = max(code_start, read_le(heap, hep_idx + 6) + 2 + num_of_funcs * 4)
+        if kind == SectionKind.CLASS:
+            code_start = max(code_start, read_le(heap, hep_idx + 4) + obj_length)
+        hep_idx += obj_length
+    assert read_le(heap, hep_idx) == 0
+    hep_idx += 2
+
+    heap_relocation_offset = read_le(heap, 0)
+    objects.append(SciSection(SectionKind.STRINGS.value, heap_base + hep_idx, heap_relocation_offset - hep_idx,
+                              heap[hep_idx:heap_relocation_offset], heap_base))
+
+    code_end = script_relocation_offset if 0 < script_relocation_offset <= len(in_script) else len(in_script)
+    assert code_start <= code_end
+    objects.append(SciSection(SectionKind.CODE.value, code_start, code_end - code_start,
+                              in_script[code_start:code_end], heap_base))
+
+    num_of_pointers = read_le(heap, heap_relocation_offset)
+    relocation_end = heap_relocation_offset + 2 + num_of_pointers * 2
+    objects.append(SciSection(SectionKind.RELOCATION.value, heap_base + heap_relocation_offset,
+                              relocation_end - heap_relocation_offset, heap[heap_relocation_offset:relocation_end],
+                              heap_base))
 
     return objects
 
@@ -448,9 +549,20 @@ LOFSA_RELATIVE = {CONFIG_LOFSA_RELATIVE}
 """
 
 
-def disasm(orig_script_file):
+def get_strings_table(objects):
+    # the strings of a disassembled script, in the same order as in its .sca
+    return [{'id': get_string_id(s), 'str': s['str'], 'special': s['special'], 'used': bool(s['usages'])}
+            for obj in objects if obj.kind == SectionKind.STRINGS for s in obj.strings]
+
+
+def dump(objects):
+    return get_configs() + '\n\n'.join([obj.str_dump() for obj in objects]) + '\n'
+
+
+def disasm_objects(orig_script_file):
     objects = split_objects(orig_script_file)
     strings_first.id = 0
+    set_object_name.names = Counter(o.name for o in objects if o.kind in [SectionKind.OBJECT, SectionKind.CLASS])
 
     # first pass
     new_objects = []
@@ -473,6 +585,8 @@ def disasm(orig_script_file):
             raise NotImplementedError
         new_objects.append(obj)
     objects = new_objects
+    global strings_index
+    strings_index = StringsIndex([obj for obj in objects if obj.kind == SectionKind.STRINGS])
 
     # second pass
     for obj in objects:
@@ -498,30 +612,129 @@ def disasm(orig_script_file):
             relocation_fourth(obj, objects)
         elif obj.kind == SectionKind.CODE:
             code_fourth(obj, objects)
+        elif obj.kind in [SectionKind.OBJECT, SectionKind.CLASS]:
+            object_fourth(obj, objects)
 
-    return get_configs() + '\n\n'.join([obj.str_dump() for obj in objects]) + '\n'
+    return objects
 
 
-def disasm_all(srcdir, asmdir):
+def disasm(orig_script_file):
+    return dump(disasm_objects(orig_script_file))
+
+
+def disasm_all_iter(srcdir, asmdir, write_model=False):
+    # yields each script's name and strings table (see get_strings_table) as soon as it's disassembled
+    # write_model: also save each script's structured model (see asm_lib.disasm_model), for other tools
     scr_files = Path(srcdir).glob('*.scr')
     asm_path = Path(asmdir)
     asm_path.mkdir(exist_ok=True, parents=True)
-    global kernels
-    kernels = Kernels(srcdir, asm_path, mode='disasm')
+    global kernels, game_db
+    kernels = get_kernels(srcdir, asm_path, mode='disasm')
+    game_db = GameDatabase(srcdir, asm_path)
     for scr in scr_files:
         if scr.name.lower() != 'install.scr':
             sca = asm_path / f'{scr.stem}.sca'
             print("--------")
             print(f"Disassembling {scr} to {sca}")
-            result = disasm(scr)
-            sca.write_text(result)
+            objects = disasm_objects(scr)
+            sca.write_text(dump(objects))
+            if write_model:
+                save_model(asm_path, scr, objects)
+            yield scr.stem, get_strings_table(objects)
+
+
+def disasm_all(srcdir, asmdir, write_model=False):
+    for _ in disasm_all_iter(srcdir, asmdir, write_model):
+        pass
+
+
+def get_statistics(orig_script_file):
+    # counts straight from the decoded opcodes and the relocation table, without the disassembly passes
+    objects = split_objects(orig_script_file)
+    memory = Path(orig_script_file).read_bytes()[2:]
+    heap_base = objects[0].heap_base
+    if heap_base is not None:
+        memory += Path(orig_script_file).with_suffix('.hep').read_bytes()[2:]
+    stats = {'instructions': 0, 'strings': 0, 'string_refs': 0, 'relocations': 0,
+             'opcodes': Counter(), 'kernels': Counter()}
+
+    strings_ranges = []
+    # pointed values (as in code_third and friends)
+    values = []
+    for obj in objects:
+        if obj.kind == SectionKind.CODE:
+            code = obj.data
+            idx = 0
+            while idx < len(code):
+                entry = DECODE_TABLE[code[idx]]
+                if entry is None:
+                    raise ValueError(f"Illegal opcode {hex(code[idx])} at {hex(obj.obj_offset + idx)}")
+                stats['instructions'] += 1
+                stats['opcodes'][entry.opcode.name] += 1
+                if entry.opcode == SciOpcodes.op_callk:
+                    kernel = int.from_bytes(code[idx + 1:idx + 1 + entry.operands_width[0]], byteorder='little')
+                    stats['kernels'][kernels.get_kernel(kernel)] += 1
+                elif heap_base is not None and entry.opcode in [SciOpcodes.op_lofsa, SciOpcodes.op_lofss]:
+                    values.append(heap_base + int.from_bytes(code[idx + 1:idx + entry.length], byteorder='little'))
+                idx += entry.length
+        elif obj.kind == SectionKind.STRINGS:
+            stats['strings'] += len([s for s in bytes(obj.data).split(b'\0') if s])
+            strings_ranges.append((obj.obj_offset, obj.obj_offset + len(obj.data)))
+        elif obj.kind == SectionKind.RELOCATION:
+            relocation_first(obj)
+            stats['relocations'] = len(obj.pointers)
+            values += [(heap_base or 0) + read_le(memory, pointer) for pointer in obj.pointers]
+    stats['string_refs'] = len([v for v in values if any(start <= v < end for start, end in strings_ranges)])
+    return stats
+
+
+def statistics_all(srcdir, target):
+    # whole game statistics (see get_statistics), to target/statistics.json and target/statistics.csv
+    # instead of disassembling
+    target = Path(target)
+    target.mkdir(exist_ok=True, parents=True)
+    global kernels
+    kernels = get_kernels(srcdir, target, mode='disasm')
+    scripts = {}
+    total = {'instructions': 0, 'strings': 0, 'string_refs': 0, 'relocations': 0,
+             'opcodes': Counter(), 'kernels': Counter()}
+    for scr in sorted(Path(srcdir).glob('*.scr'), key=lambda p: p.name.lower()):
+        if scr.name.lower() != 'install.scr':
+            stats = get_statistics(scr)
+            for key in total:
+                total[key] += stats[key]
+            scripts[scr.stem] = stats
+
+    with open(target / 'statistics.csv', 'w', newline='', encoding='UTF-8') as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(['script', 'category', 'name', 'count'])
+        for name, stats in list(scripts.items()) + [('total', total)]:
+            for key in ['instructions', 'strings', 'string_refs', 'relocations']:
+                writer.writerow([name, 'summary', key, stats[key]])
+            for key in ['opcodes', 'kernels']:
+                for item, count in stats[key].most_common():
+                    writer.writerow([name, key[:-1], item, count])
+
+    for stats in list(scripts.values()) + [total]:
+        for key in ['opcodes', 'kernels']:
+            stats[key] = dict(stats[key].most_common())
+    (target / 'statistics.json').write_text(json.dumps({'scripts': scripts, 'total': total}, indent=1))
+    return total
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
                                      description=f"Sierra 'SCRIPT' disassembler - WIP", )
     parser.add_argument("srcdir", help="src directory containing the scripts (.scr, maybe also .hep) files")
-    parser.add_argument("asmdir", help="directory to write the assembly (.sca) files")
+    parser.add_argument("asmdir", help="directory to write the assembly (.sca) files (or the statistics)")
+    parser.add_argument("--model", action='store_true',
+                        help="also write each script's disassembly model (.model), used by other tools")
+    parser.add_argument("--stats", "-s", action='store_true',
+                        help="instead of disassembling, count opcodes, kernel calls, strings references and relocations "
+                             "of all the scripts, to statistics.json and statistics.csv")
     args = parser.parse_args()
 
-    disasm_all(args.srcdir, args.asmdir)
+    if args.stats:
+        statistics_all(args.srcdir, args.asmdir)
+    else:
+        disasm_all(args.srcdir, args.asmdir, args.model)
@@ -0,0 +1,131 @@
+# Replaces strings of compiled (SCI0) scripts, without disassembling and assembling them again
+# the STRINGS section is rebuilt, the sections after it are shifted, and the pointers are fixed through the relocation
+# table - the result is the same as replacing the strings in the disassembly (.sca) and assembling it
+
+import argparse
+import bisect
+import struct
+
+from asm_lib.misc import *
+from asm_lib.sci_section import SectionKind
+from script_disasm import split_objects
+
+
+def get_strings(section, first_id):
+    # same ids as script_disasm.strings_first
+    strings = []
+    offset = section.obj_offset
+    for i, s in enumerate(bytes(section.data).split(b'\0')):
+        strings.append({'id': f'string_{first_id + i}', 'offset': offset, 'bytes': s, 'deltas': set()})
+        offset += len(s) + 1
+    return strings
+
+
+def get_new_string(string_id, orig, translations, filename):
+    if string_id not in translations:
+        return orig
+    s_from, s_to = translations[string_id]
+    # as in the disassembly (and the .csv)
+    if s_from is not None and escape_string(orig.decode(ENCODING_OUTPUT)).replace(r'\"', '"') != s_from:
+        print(f"WARNING: ({string_id} of {filename}) failed to replace '{s_from}' to '{s_to}' ")
+        return orig
+    return de_escape_string(s_to).encode(ENCODING_OUTPUT)
+
+
+def is_patchable(sections):
+    # only SCI0 scripts, with (at most) one STRINGS section, followed by sections which can move
+    # otherwise code and objects would move too - such scripts should be assembled from their disassembly instead
+    if any(section.heap_base is not None for section in sections):
+        return False
+    strings_sections = [section for section in sections if section.kind == SectionKind.STRINGS]
+    if not strings_sections:
+        return True
+    if len(strings_sections) > 1:
+        return False
+    following = sections[sections.index(strings_sections[0]) + 1:]
+    return all(section.kind in [SectionKind.PRELOAD_TEXT, SectionKind.LOCAL_VARS, SectionKind.RELOCATION]
+               for section in following)
+
+
+def can_patch(script_file):
+    return is_patchable(split_objects(script_file))
+
+
+def patch_strings(script_file, translations):
+    # translations: string id (as in the disassembly, e.g. 'string_12') -> (original string or None, new string)
+    sections = split_objects(script_file)
+    assert is_patchable(sections), f"{script_file} can't be patched, assemble it instead"
+    in_script = Path(script_file).read_bytes()[2:]
+
+    strings_sections = [section for section in sections if section.kind == SectionKind.STRINGS]
+    if not strings_sections:
+        return SIERRA_SCRIPT_HEADER + in_script
+    strings_section = strings_sections[0]
+    following = sections[sections.index(strings_section) + 1:]
+
+    relocations = [section for section in following if section.kind == SectionKind.RELOCATION]
+    pointers = []
+    if relocations:
+        pointers = [read_le(relocations[0].data, 4 + i * 2) for i in range(read_le(relocations[0].data, 0))]
+
+    strings = get_strings(strings_section, 0)
+    starts = [s['offset'] for s in strings]
+    # pointers into the middle of a string become strings of their own (string_N_offset_M), like in the disassembly
+    for pointer in pointers:
+        value = read_le(in_script, pointer)
+        if starts[0] <= value <= starts[-1]:
+            s = strings[bisect.bisect_right(starts, value) - 1]
+            assert value <= s['offset'] + len(s['bytes'])
+            if value != s['offset']:
+                s['deltas'].add(value - s['offset'])
+
+    # old offset -> new offset
+    new_offsets = {}
+    new_strings = []
+    offset = strings_section.obj_offset
+    for s in strings:
+        for delta in [0] + sorted(s['deltas']):
+            string_id = f"{s['id']}_offset_{delta}" if delta else s['id']
+            new_string = get_new_string(string_id, s['bytes'][delta:], translations, Path(script_file).name)
+            new_offsets[s['offset'] + delta] = offset
+            new_strings.append(new_string)
+            offset += len(new_string) + 1
+    data = b'\0'.join(new_strings)
+    if len(data) % 2 == 1:
+        data += b'\0'
+
+    old_end = strings_section.obj_offset + len(strings_section.data)
+    shift = len(data) - len(strings_section.data)
+
+    def get_new_offset(old):
+        if old in new_offsets:
+            return new_offsets[old]
+        elif old >= old_end:
+            return old + shift
+        return old
+
+    output = bytearray(in_script[:strings_section.obj_offset - 4])
+    output += struct.pack('<HH', SectionKind.STRINGS.value, len(data) + 4)
+    output += data
+    output += in_script[old_end:]
+
+    for i, pointer in enumerate(pointers):
+        new_pointer = get_new_offset(pointer)
+        new_value = get_new_offset(read_le(in_script, pointer))
+        assert new_pointer < 0x10000 and new_value < 0x10000, "Script is too big"
+        struct.pack_into('<H', output, new_pointer, new_value)
+        struct.pack_into('<H', output, get_new_offset(relocations[0].obj_offset) + 4 + i * 2, new_pointer)
+
+    return SIERRA_SCRIPT_HEADER + bytes(output)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                         description="Replaces a string of a compiled script (.scr)", )
+    arg_parser.add_argument("src", help="compiled script (.scr) file")
+    arg_parser.add_argument("target", help="file to write the patched script to")
+    arg_parser.add_argument("string_id", help="string id, as in the disassembly (e.g. string_12)")
+    arg_parser.add_argument("string", help="new string")
+    args = arg_parser.parse_args()
+
+    Path(args.target).write_bytes(patch_strings(args.src, {args.string_id: (None, args.string)}))
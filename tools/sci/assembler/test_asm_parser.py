@@ -0,0 +1,23 @@
+from pathlib import Path
+from unittest import TestCase
+
+from asm_lib import asm_parser, asm_lexer, asm_stream_parser
+from asm_lib.misc import ENCODING_INPUT
+
+games = [x for x in (Path(__file__).parent / 'tests').iterdir() if x.is_dir()]
+
+
+class Test(TestCase):
+    def test_parity_with_ply(self):
+        for game in games:
+            for orig in (game / 'orig_sca').glob('*.sca'):
+                text = orig.read_text(encoding=ENCODING_INPUT)
+                asm_lexer.start()
+                expected = asm_parser.parser.parse(text)
+                self.assertEqual(expected, asm_stream_parser.parse(text), msg=f'Parsers differ for {orig}')
+
+    def test_syntax_error(self):
+        for text in ['', '.CODE\n\t\tpushi\t0x1, 0x2\n', '.STRINGS\nstring_0 "missing colon"\n',
+                     '.OBJECT a of 0x1\nSelectors [2]:\n  [#0] = 0x0\n']:
+            with self.assertRaises(SyntaxError, msg=repr(text)):
+                asm_stream_parser.parse(text)
@@ -0,0 +1,132 @@
+# Round trip regression and timing tests for the assembler and the disassembler
+# for every script of every game under 'tests': .sca --asm--> .scr --disasm--> .sca --asm--> .scr
+# - the disassembly should have the same lines as the original assembly (ignoring the strings numbering)
+# - both assemblies should be byte-identical
+# - each script's assemble/disassemble durations are compared to 'tests/timings.json', only if CHECK_TIMINGS=1
+#   (timings depend on the machine - set UPDATE_TIMINGS=1 to record a new baseline on yours)
+
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import script_asm
+import script_disasm
+from asm_lib.game_db import GameDatabase
+from asm_lib.misc import get_kernels, ENCODING_INPUT
+from asm_lib.sci_section import SciSection
+
+TESTS_PATH = Path(__file__).parent / 'tests'
+TIMINGS_BASELINE = TESTS_PATH / 'timings.json'
+# a script fails if it's slower than TIMINGS_TOLERANCE * baseline + TIMINGS_SLACK seconds
+TIMINGS_TOLERANCE = float(os.environ.get('TIMINGS_TOLERANCE', 3))
+TIMINGS_SLACK = 0.1
+
+games = sorted([x for x in TESTS_PATH.iterdir() if x.is_dir()])
+scripts = [(game.name, orig.name) for game in games for orig in sorted((game / 'orig_sca').glob('*.sca'))]
+
+
+def ignores(lines):
+    return [re.sub(r'string_.*\d+', 'string_NNN', s) for s in lines]
+
+
+def init_game(game):
+    # kernels are per game; workers may get scripts of different games
+    if getattr(init_game, 'game', None) != game:
+        script_asm.kernels = get_kernels(game / 'orig_sca', game / 'bin', mode='asm')
+        script_disasm.kernels = get_kernels(game / 'bin', game / 'disasm', mode='disasm')
+        init_game.game = game
+
+
+def round_trip(game_name, script_name):
+    game = TESTS_PATH / game_name
+    init_game(game)
+    orig = game / 'orig_sca' / script_name
+    scr = game / 'bin' / f'{orig.stem}.scr'
+    sca = game / 'disasm' / script_name
+
+    start = time.perf_counter()
+    assembled = script_asm.asm(orig)
+    asm_duration = time.perf_counter() - start
+    scr.write_bytes(assembled)
+
+    start = time.perf_counter()
+    disassembled = script_disasm.disasm(scr)
+    disasm_duration = time.perf_counter() - start
+    sca.write_text(disassembled, encoding=ENCODING_INPUT)
+
+    orig_set = set(ignores(orig.read_text(encoding=ENCODING_INPUT).splitlines()))
+    other_set = set(ignores(disassembled.splitlines()))
+    diff = orig_set.symmetric_difference(other_set)
+    diff.discard('\n')
+
+    return {
+        'diff': sorted(diff),
+        'identical': script_asm.asm(sca) == assembled,
+        'analyzed_size': script_asm.analyze(orig.read_text(encoding=ENCODING_INPUT))['size'],
+        'size': len(assembled),
+        'timings': {'asm': round(asm_duration, 4), 'disasm': round(disasm_duration, 4)},
+    }
+
+
+@pytest.fixture(scope='module')
+def results():
+    for game in games:
+        shutil.rmtree(game / 'disasm', ignore_errors=True)
+        shutil.rmtree(game / 'bin', ignore_errors=True)
+        (game / 'bin').mkdir()
+        (game / 'disasm').mkdir()
+        # creates the 999.voc (needed for the disassembly) once, before the workers start
+        get_kernels(game / 'orig_sca', game / 'bin', mode='asm')
+
+    with ProcessPoolExecutor() as executor:
+        futures = {script: executor.submit(round_trip, *script) for script in scripts}
+        return {script: future.result() for script, future in futures.items()}
+
+
+@pytest.mark.parametrize('game_name, script_name', scripts, ids=[f'{g}/{s}' for g, s in scripts])
+def test_round_trip(results, game_name, script_name):
+    result = results[(game_name, script_name)]
+    assert not result['diff'], \
+        f'Disassembly of assembly of {game_name}/{script_name} differs:\n' + '\n'.join(result['diff'])
+    assert result['identical'], f'Re-assembly of {game_name}/{script_name} is not byte-identical'
+    assert result['analyzed_size'] == result['size']
+
+
+def test_timings(results):
+    timings = {f'{game_name}/{script_name}': result['timings']
+               for (game_name, script_name), result in results.items()}
+    if os.environ.get('UPDATE_TIMINGS'):
+        TIMINGS_BASELINE.write_text(json.dumps(timings, indent=1, sort_keys=True))
+        pytest.skip(f'Recorded new timings baseline at {TIMINGS_BASELINE}')
+    if not os.environ.get('CHECK_TIMINGS'):
+        pytest.skip('Set CHECK_TIMINGS=1 to compare the timings to the baseline')
+    if not TIMINGS_BASELINE.exists():
+        pytest.skip(f'No timings baseline at {TIMINGS_BASELINE} (set UPDATE_TIMINGS=1 to record it)')
+
+    baseline = json.loads(TIMINGS_BASELINE.read_text())
+    slow = []
+    for script, durations in timings.items():
+        for kind, duration in durations.items():
+            try:
+                expected = baseline[script][kind]
+            except KeyError:
+                continue
+            if duration > expected * TIMINGS_TOLERANCE + TIMINGS_SLACK:
+                slow.append(f'{script} {kind}: {duration:.3f}s (baseline: {expected:.3f}s)')
+    assert not slow, 'Slower than the baseline:\n' + '\n'.join(slow)
+
+
+def test_game_db(results, tmp_path):
+    for game in games:
+        game_db = GameDatabase(game / 'bin', tmp_path)
+        class_names = [re.sub(r'(_u)+$', '', line.split()[1]) for orig in (game / 'orig_sca').glob('*.sca')
+                       for line in orig.read_text(encoding=ENCODING_INPUT).splitlines() if line.startswith('.CLASS ')]
+        assert set(class_names) == {SciSection.sanitize(None, c['name']) for c in game_db.classes.values()}
+        # second time is loaded from the cache
+        assert GameDatabase(game / 'bin', tmp_path).classes == game_db.classes
@@ -0,0 +1,112 @@
+import struct
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import script_asm
+import script_disasm
+from asm_lib.disasm_model import load_model
+from asm_lib.misc import get_kernels, SIERRA_SCRIPT_HEADER, SIERRA_HEAP_HEADER, SCRIPT_OBJECT_MAGIC_NUMBER
+from asm_lib.strings_index import StringsIndex
+
+GAME_PATH = Path(__file__).parent / 'tests' / 'sq1vga'
+
+
+def words(*values):
+    return struct.pack(f'<{len(values)}H', *values)
+
+
+def test_sci11(tmp_path):
+    # a minimal SCI1.1 script: an exported object (with one function) and an exported procedure
+    script = words(24, 0, 0, 2, 18, 22)  # relocation offset, 0, 0, exports: ego, procedure
+    script += words(1, 0x8a, 18)  # ego's functions table
+    script += bytes([0x72]) + words(48) + bytes([0x48])  # lofsa "World", ret
+    script += bytes([0x48, 0])  # ret, padding
+    script += words(1, 8)  # relocation of the first export, ego (a heap pointer)
+    # relocation offset, local variables: "Hello" and 6 more, so ego's offset is the offset of lofsa (0x12) too
+    heap = words(54, 7, 42, 0, 0, 0, 0, 0, 0)
+    heap += words(SCRIPT_OBJECT_MAGIC_NUMBER, 9, 0, 12, 0, 0x10, 0x5, 0, 38)  # ego
+    heap += words(0)
+    heap += b'ego\0Hello\0World\0'
+    heap += words(2, 4, 34)  # relocation of the local variable and the name
+    (tmp_path / '1.scr').write_bytes(SIERRA_SCRIPT_HEADER + script)
+    (tmp_path / '1.hep').write_bytes(SIERRA_HEAP_HEADER + heap)
+
+    script_disasm.kernels = get_kernels(tmp_path, tmp_path, mode='disasm')
+    lines = script_disasm.disasm(tmp_path / '1.scr').splitlines()
+
+    assert 'string_0: "ego"\t\t ; special' in lines
+    assert 'string_1: "Hello"' in lines
+    assert 'string_2: "World"' in lines
+    assert '.OBJECT ego of 0x5' in lines
+    assert '  [0x8a]  = ego::138   \t ; @0x12' in lines
+    assert 'ego::138:' in lines
+    assert '\t\tlofsa\tstring_2\t\t; "World"' in lines
+    assert 'code_22  ; ret' in lines
+    assert 'code_22:' in lines
+    assert "{'val': 'Hello', 'id': 'string_1'}, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0" in lines
+    # the first export is relocated, so it's ego, not the instruction at the same offset
+    exports = lines.index('.EXPORTS')
+    assert lines[exports + 1:exports + 3] == ['OBJECT ego of 0x5', 'code_22  ; ret']
+    assert lines[lines.index('.OBJECT ego of 0x5') + 1] == 'Exported'
+    assert 'num of pointers: 3' in lines
+
+
+def test_substrings():
+    # two pointers into the same string: both are offsets into the original string, whatever their order
+    strings = [{'offset': 10, 'str': 'Hello world', 'id': 0, 'usages': [], 'special': False},
+               {'offset': 30, 'str': 'Bye', 'id': 1, 'usages': [], 'special': False}]
+    section = SimpleNamespace(strings=list(strings))
+    script_disasm.strings_index = StringsIndex([section])
+    pointers = {}
+    first = script_disasm.string_match_not_on_start(pointers, 13, 100, {})
+    second = script_disasm.string_match_not_on_start(pointers, 16, 102, {})
+    assert (first['id'], first['str']) == ('0_offset_3', 'lo world')
+    assert (second['id'], second['str']) == ('0_offset_6', 'world')
+    assert [s['offset'] for s in section.strings] == [10, 13, 16, 30]
+    assert script_disasm.strings_index.get_matches(16) == [second]
+    assert not script_disasm.strings_index.is_unused(strings[0])
+    assert script_disasm.string_match_not_on_start(pointers, 5, 104, {}) is None
+
+
+@pytest.fixture
+def assemble(tmp_path):
+    # assembles scripts of the test game into tmp_path / 'src', returns the function doing it
+    script_asm.kernels = get_kernels(GAME_PATH / 'orig_sca', tmp_path, mode='asm')
+    script_disasm.kernels = get_kernels(tmp_path, tmp_path, mode='disasm')
+    srcdir = tmp_path / 'src'
+    srcdir.mkdir()
+
+    def assemble_script(script_name):
+        scr = srcdir / f'{script_name}.scr'
+        scr.write_bytes(script_asm.asm(GAME_PATH / 'orig_sca' / f'{script_name}.sca'))
+        return scr
+
+    return assemble_script
+
+
+def test_model(tmp_path, assemble):
+    scr = assemble('61')
+    tables = dict(script_disasm.disasm_all_iter(scr.parent, tmp_path / 'asm', write_model=True))
+    model = load_model(tmp_path / 'asm', scr)
+    assert [{k: s[k] for k in ['id', 'str', 'special', 'used']} for s in model['strings']] == tables['61']
+    assert any('offset' in u for s in model['strings'] for u in s['usages'])
+    assert all(s['usages'] for s in model['strings'] if s['used'])
+    assert [section['kind'] for section in model['sections']].count('RELOCATION') == 1
+
+    # outdated
+    scr.write_bytes(scr.read_bytes() + b'\0\0')
+    assert load_model(tmp_path / 'asm', scr) is None
+
+
+def test_statistics(assemble):
+    scr = assemble('0')
+    objects = script_disasm.disasm_objects(scr)
+    stats = script_disasm.get_statistics(scr)
+
+    code = [instr for obj in objects if obj.kind.name == 'CODE' for instr in obj.instructions]
+    strings = [s for obj in objects if obj.kind.name == 'STRINGS' for s in obj.strings]
+    assert stats['instructions'] == len(code)
+    assert stats['string_refs'] == sum(len(s['usages']) for s in strings)
+    assert stats['kernels']['StrCpy'] == len([instr for instr in code if str(instr.operands).startswith('StrCpy,')])
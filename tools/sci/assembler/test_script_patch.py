@@ -0,0 +1,61 @@
+import re
+from pathlib import Path
+
+import pytest
+
+import script_asm
+import script_disasm
+import script_patch
+from asm_lib.misc import get_kernels, ENCODING_INPUT
+from asm_lib.sci_section import SciSection, SectionKind
+
+GAME_PATH = Path(__file__).parent / 'tests' / 'sq1vga'
+
+
+# with strings in the middle of other strings, local variables, preload text, and a big one
+@pytest.mark.parametrize('script_name', ['0', '1', '61', '65', '103', '255', '996'])
+def test_same_as_assembling(tmp_path, script_name):
+    script_asm.kernels = get_kernels(GAME_PATH / 'orig_sca', tmp_path, mode='asm')
+    script_disasm.kernels = get_kernels(tmp_path, tmp_path, mode='disasm')
+    scr = tmp_path / f'{script_name}.scr'
+    scr.write_bytes(script_asm.asm(GAME_PATH / 'orig_sca' / f'{script_name}.sca'))
+
+    # make some strings longer and some shorter, both in the disassembly and the translations
+    lines = script_disasm.disasm(scr).splitlines()
+    translations = {}
+    for i, line in enumerate(lines):
+        match = re.match(r'(string_\d+(?:_offset_\d+)?): "(.*)"$', line)
+        if match:
+            string_id, orig = match.groups()
+            if len(translations) % 2:
+                new = orig + ' and some more'
+            else:
+                new = orig[:len(orig) // 2].rstrip('\\')
+            translations[string_id] = (orig.replace(r'\"', '"'), new)
+            lines[i] = f'{string_id}: "{new}"'
+    sca = tmp_path / f'{script_name}.sca'
+    sca.write_text('\n'.join(lines), encoding=ENCODING_INPUT)
+
+    assert script_patch.patch_strings(scr, translations) == script_asm.asm(sca)
+
+
+def test_wrong_original(tmp_path, capsys):
+    script_asm.kernels = get_kernels(GAME_PATH / 'orig_sca', tmp_path, mode='asm')
+    scr = tmp_path / '0.scr'
+    scr.write_bytes(script_asm.asm(GAME_PATH / 'orig_sca' / '0.sca'))
+
+    assert script_patch.patch_strings(scr, {'string_1': ('not the original', 'new')}) == scr.read_bytes()
+    assert 'WARNING' in capsys.readouterr().out
+
+
+def test_is_patchable():
+    def sections(*kinds, heap_base=None):
+        return [SciSection(kind.value, i * 4, 4, b'\0\0', heap_base) for i, kind in enumerate(kinds)]
+
+    assert script_patch.is_patchable(sections(SectionKind.CODE, SectionKind.STRINGS, SectionKind.RELOCATION))
+    assert script_patch.is_patchable(sections(SectionKind.CODE, SectionKind.RELOCATION))
+    # code after the strings would move too
+    assert not script_patch.is_patchable(sections(SectionKind.STRINGS, SectionKind.CODE, SectionKind.RELOCATION))
+    assert not script_patch.is_patchable(sections(SectionKind.STRINGS, SectionKind.STRINGS))
+    # SCI1.1
+    assert not script_patch.is_patchable(sections(SectionKind.CODE, SectionKind.STRINGS, heap_base=8))
@@ -0,0 +1,40 @@
+# Groups the rows of a csv by the resource they belong to (e.g. a room), for the importers to build each resource
+# as soon as its rows were read, instead of keeping the whole csv in memory and scanning it again for every resource
+
+from itertools import groupby
+
+
+def is_grouped(rows, key):
+    # whether the rows of every key are consecutive
+    seen = set()
+    last = None
+    for row in rows:
+        k = key(row)
+        if k != last:
+            if k in seen:
+                return False
+            seen.add(k)
+            last = k
+    return True
+
+
+def group_rows(read_rows, key):
+    # read_rows: returns a new iterator over the rows each time it's called (e.g. opens the csv again)
+    # yields (key, rows of that key) - rows without a key are skipped
+    # if the rows of a key aren't consecutive (e.g. a sorted spreadsheet), they are all read to memory and sorted
+    def keyed_rows():
+        return (row for row in read_rows() if key(row) not in ('', None))
+
+    rows = keyed_rows()
+    if not is_grouped(keyed_rows(), key):
+        print("WARNING: the rows of each file aren't consecutive, reading the whole csv")
+        rows = sorted(rows, key=key)
+    for k, group in groupby(rows, key=key):
+        yield k, list(group)
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
@@ -49,11 +49,11 @@ if __name__ == "__main__":
 
     Path(args.csvdir).mkdir(exist_ok=True)
 
-    # first, let's make a disassembly
+    # first, let's make a disassembly (the strings are exported as each script is disassembled)
+    # it's the only pass over the scripts in the export, so the disassembly models aren't written here
+    # (see script_disasm --model and strings_export --gamedir)
     asm_path = Path(args.csvdir) / 'asm' / 'orig'
-    assembler.script_disasm.disasm_all(args.gamedir, asm_path)
-
-    strings_export.strings_export(asm_path, args.csvdir)
+    strings_export.strings_export(asm_path, args.csvdir, assembler.script_disasm.disasm_all_iter(args.gamedir, asm_path))
     texts_export.texts_export(args.gamedir, args.csvdir)
     try:
         vocab_export.vocab_export(args.gamedir, args.csvdir)
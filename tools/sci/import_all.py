@@ -49,6 +49,11 @@ if __name__ == "__main__":
     parser.add_argument("workingdir", help="directory to put excel, csv and patches files, and installer")
     parser.add_argument("--skip_download", "-s", action='store_true', help="Skip downloading from Google Drive")
     parser.add_argument("--debug", action='store_true', help="create debug files")
+    parser.add_argument("--binary_strings", action='store_true',
+                        help="Import scripts' strings by patching the compiled (SCI0) scripts, instead of assembling "
+                             "modified disassembly (scripts which can't be patched are still assembled)")
+    parser.add_argument("--incremental", "-i", action='store_true',
+                        help="Only write the messages files whose translations changed since the last import")
     args = parser.parse_args()
 
     if args.skip_download:
@@ -66,14 +71,18 @@ if __name__ == "__main__":
         csvname = os.path.splitext(os.path.split(filename)[1])[0]
         if csvname == 'messages':
             print("\n**** Messages import ****")
-            messages_import.messages_import(args.workingdir, args.input_game_dir, patches_dir)
+            messages_import.messages_import(args.workingdir, args.input_game_dir, patches_dir, args.incremental)
         elif csvname == 'texts':
             print("\n**** Texts import ****")
             texts_import.texts_import(args.workingdir, patches_dir)
         elif csvname == 'scripts_strings':
             print("\n**** Scripts' strings import: ****")
-            strings_import.strings_import(args.workingdir)
-            assembler.script_asm.asm_all(Path(args.workingdir) / 'asm' / 'modified', patches_dir)
+            files = None
+            if args.binary_strings:
+                files = strings_import.strings_import_binary(args.workingdir, args.input_game_dir, patches_dir)
+            if files is None or files:
+                strings_import.strings_import(args.workingdir, files=files)
+                assembler.script_asm.asm_all(Path(args.workingdir) / 'asm' / 'modified', patches_dir)
         elif csvname == 'vocab':
             print("\n**** Vocab import: ****")
             vocab_import.vocab_import(args.workingdir, patches_dir, args.output_game_dir, args.debug)
@@ -5,14 +5,11 @@ import argparse
 import csv
 import glob
 import os
-import binascii
 
 import config
+from messages_file import parse_msg
 
 MESSAGES_PATTERN = "*.msg"
-SIERRA_MESSAGE_HEADER = b'\x8f\00'
-TRADUSCI_MESSAGE_HEADER = b'\x0f\00'
-SIERRA_CODEPAGE = 'CP437'
 
 
 def error(s):
@@ -21,20 +18,9 @@ def error(s):
     sys.exit(1)
 
 
-def read_le(l, idx):
-    return l[idx] + l[idx + 1] * 256
-
-
-def read_string(lob, idx):
-    result = ""
-    while lob[idx] != 0:
-        result += (lob[idx]).to_bytes(1, "little").decode(SIERRA_CODEPAGE)
-        idx += 1
-    return result
-
-
 def write_csv(kind, csvdir, entries):
-    with open(os.path.join(csvdir, config.messages_csv_filename), 'w', newline='', encoding='UTF-8-sig') as output_file:
+    with open(os.path.join(csvdir, config.messages_csv_filename), 'w', newline='', encoding='UTF-8-sig',
+              errors='surrogateescape') as output_file:
         keys = ['room', 'noun', 'verb', ]
         if kind in ['ok', 'best']:
             keys.extend(['condition', 'sequence', 'talker', 'padding'])
@@ -59,65 +45,10 @@ def messages_export(gamedir, csvdir):
         except:
             continue
 
-        entries[room] = []
-
         with open(filename, "rb") as f:
-            lob = list(f.read())
-
-        assert bytes(lob[:2]) in {SIERRA_MESSAGE_HEADER, TRADUSCI_MESSAGE_HEADER}, bytes(lob[:2])
-        lob = lob[2:]
-        index = 0
-        version = read_le(lob, index)
-        index += 2
-
-        # pad bytes
-        index += 2
-
-        # Kawa's taxonomy :-)
-        if version <= 2101:
-            kind = "lame"
-        elif version <= 3411:
-            kind = "ok"
-        else:
-            kind = "best"
-
-        if kind == "ok":
-            index += 2
-        elif kind == "best":
-            index += 4
-
-        amount = read_le(lob, index)
-        index += 2
-
-        padding_size = 0
-        if kind == 'ok':
-            # 3 bytes padding
-            padding_size = 3
-        if kind == 'best':
-            # 4 bytes of references - currently ignored
-            padding_size = 4
-
-        # print(amount)
-        for i in range(amount):
-            entry = {'room': room,
-                     'translation': '',
-                     'comments': ''}
-            entry['noun'] = lob[index]
-            entry['verb'] = lob[index + 1]
-            if kind == 'lame':
-                entry['offset'] = read_le(lob, index + 2)
-                index += 4
-            else:
-                entry['condition'] = lob[index + 2]
-                entry['sequence'] = lob[index + 3]
-                entry['talker'] = lob[index + 4]
-                entry['offset'] = read_le(lob, index + 5)
-                entry['padding'] = binascii.hexlify(bytes(lob[index + 7: index + 7 + padding_size])).decode('UTF-8-sig')
-                index += 7 + padding_size
-
-            entry['original'] = read_string(lob, entry['offset'])
-            entries[room].append(entry)
-            # print(entry)
+            kind, _, entries[room] = parse_msg(f.read())
+        for entry in entries[room]:
+            entry.update({'room': room, 'translation': '', 'comments': ''})
     if entries:
         write_csv(kind, csvdir, entries)
 
@@ -0,0 +1,103 @@
+# Parser of messages files (*.msg), shared by messages_export and messages_import
+# and the manifest of imported messages files, for importing only the changed ones (also used by tradusci_import)
+# based on http://sciprogramming.com/community/index.php?topic=1986.msg14363#msg14363
+# also, CP437 is assumed, based on http://sciprogramming.com/community/index.php?topic=1790.msg11815#msg11815
+
+import hashlib
+import json
+import struct
+from pathlib import Path
+
+from text_codec import SIERRA_CODEPAGE, decode, read_cstring
+
+SIERRA_MESSAGE_HEADER = b'\x8f\00'
+TRADUSCI_MESSAGE_HEADER = b'\x0f\00'
+MANIFEST_FILE = 'messages_manifest.json'
+# part of every hash - increase it whenever the written files change for the same input (e.g. a fix of update_msg
+# or of tradusci_import.save_msg_file), so the next incremental import writes all of them again
+MANIFEST_VERSION = 1
+
+# index table entries: noun, verb, (condition, sequence, talker,) offset of the message (, padding)
+ENTRY_FORMATS = {
+    'lame': struct.Struct('<BBH'),
+    # 3 bytes padding
+    'ok': struct.Struct('<BBBBBH3s'),
+    # 4 bytes of references - currently ignored
+    'best': struct.Struct('<BBBBBH4s'),
+}
+
+
+def read_le(l, idx):
+    return l[idx] + l[idx + 1] * 256
+
+
+def get_kind(version):
+    # Kawa's taxonomy :-)
+    if version <= 2101:
+        return "lame"
+    elif version <= 3411:
+        return "ok"
+    else:
+        return "best"
+
+
+def parse_msg(data):
+    # returns the kind of the file, the offset of its index table (after the file header) and its entries
+    assert data[:2] in {SIERRA_MESSAGE_HEADER, TRADUSCI_MESSAGE_HEADER}, data[:2]
+    lob = data[2:]
+    kind = get_kind(read_le(lob, 0))
+    # version, pad bytes, and more
+    index = 4 + {'lame': 0, 'ok': 2, 'best': 4}[kind]
+    amount = read_le(lob, index)
+    index += 2
+
+    entry_format = ENTRY_FORMATS[kind]
+    entries = []
+    for fields in entry_format.iter_unpack(lob[index:index + entry_format.size * amount]):
+        if kind == 'lame':
+            noun, verb, offset = fields
+            entry = {'noun': noun, 'verb': verb}
+        else:
+            noun, verb, condition, sequence, talker, offset, padding = fields
+            entry = {'noun': noun, 'verb': verb, 'condition': condition, 'sequence': sequence, 'talker': talker,
+                     'padding': padding.hex()}
+        entry['offset'] = offset
+        entry['original'] = decode(read_cstring(lob, offset)[0])
+        entries.append(entry)
+    return kind, index, entries
+
+
+def get_hash(*parts):
+    # parts: anything json can dump (e.g. the csv rows of a file), or bytes
+    h = hashlib.sha1(str(MANIFEST_VERSION).encode('UTF-8'))
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else json.dumps(part).encode('UTF-8'))
+    return h.hexdigest()
+
+
+def load_manifest(manifest_dir, target):
+    # file name -> hash of what it was made from (see get_hash), as of the last import to target
+    # the manifest is kept in manifest_dir (e.g. with the csv), not in target - which is shipped to the players
+    try:
+        manifest = json.loads((Path(manifest_dir) / MANIFEST_FILE).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('target') != str(Path(target).resolve()):
+        return {}
+    return manifest['files']
+
+
+def save_manifest(manifest_dir, target, files):
+    manifest = {'target': str(Path(target).resolve()), 'files': files}
+    (Path(manifest_dir) / MANIFEST_FILE).write_text(json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def is_unchanged(target, manifest, filename, h):
+    return manifest.get(filename) == h and (Path(target) / filename).exists()
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
@@ -8,10 +8,10 @@ import os
 import binascii
 
 import config
-
-SIERRA_MESSAGE_HEADER = b'\x8f\00'
-TRADUSCI_MESSAGE_HEADER = b'\x0f\00'
-SIERRA_CODEPAGE = 'CP437'
+from csv_groups import group_rows
+from messages_file import parse_msg, ENTRY_FORMATS, SIERRA_MESSAGE_HEADER, SIERRA_CODEPAGE, get_hash, load_manifest, \
+    save_manifest, is_unchanged
+from text_codec import encode
 
 
 def error(s):
@@ -20,55 +20,22 @@ def error(s):
     sys.exit(1)
 
 
-def read_le(l, idx):
-    return l[idx] + l[idx + 1] * 256
-
-
 def update_msg(original, entries):
-    assert bytes(original[:2]) in {SIERRA_MESSAGE_HEADER, TRADUSCI_MESSAGE_HEADER}, bytes(original[:2])
+    kind, index, original_entries = parse_msg(original)
     lob = original[2:]
-    index = 0
-    version = read_le(lob, index)
-    index += 2
-
-    # pad bytes
-    index += 2
-
-    # Kawa's taxonomy :-)
-    if version <= 2101:
-        kind = "lame"
-    elif version <=3411:
-        kind = "ok"
-    else:
-        kind = "best"
-
-    if kind == "ok":
-        index += 2
-    elif kind == "best":
-        index += 4
-
-    amount = read_le(lob, index)
-    index += 2
+    amount = len(original_entries)
     assert amount == len(entries)
 
-    padding_size = 0
-    if kind == 'ok':
-        # 3 bytes padding
-        padding_size = 3
-    if kind == 'best':
-        # 4 bytes of references - currently ignored
-        padding_size = 4
-
     with io.BytesIO() as ostr, io.BytesIO() as mstr:
         offs = []
-        entry_size = 4 if kind == 'lame' else 7 + padding_size
+        entry_size = ENTRY_FORMATS[kind].size
         base = index + entry_size * amount
         extra = base + 2
         ostr.write(SIERRA_MESSAGE_HEADER + lob[:index])
         for entry in entries:
             offs.append(mstr.tell() + base)
-            message = entry[config.messages_keys['translation']].encode('windows-1255')
-            origm = entry[config.messages_keys['original']].encode(SIERRA_CODEPAGE)
+            message = encode(entry[config.messages_keys['translation']])
+            origm = encode(entry[config.messages_keys['original']], SIERRA_CODEPAGE)
             if not message:
                 message = origm
             mstr.write(message + b'\0')
@@ -108,13 +75,20 @@ def my_int(s):
         return s
 
 
-def messages_import(csvdir, input_game_dir, output_game_dir):
-    with open(os.path.join(csvdir, config.messages_csv_filename), newline='', encoding='utf-8-sig') as csvfile:
-        texts = [{k: v for k, v in row.items()}
-                 for row in csv.DictReader(csvfile, skipinitialspace=True)]
-    rooms = sorted(list(set([my_int(entry[config.messages_keys['room']]) for entry in texts if entry[config.messages_keys['room']]])))
-    for room in rooms:
-        entries = [entry for entry in texts if my_int(entry[config.messages_keys['room']]) == room]
+def messages_import(csvdir, input_game_dir, output_game_dir, incremental=False):
+    # incremental: only rooms whose rows (or original file) changed since the last import are written
+    manifest = load_manifest(csvdir, output_game_dir)
+    written = 0
+    rooms = 0
+
+    def read_rows():
+        with open(os.path.join(csvdir, config.messages_csv_filename), newline='', encoding='utf-8-sig',
+                  errors='surrogateescape') as csvfile:
+            yield from csv.DictReader(csvfile, skipinitialspace=True)
+
+    # each room is written as soon as its rows are read
+    for room, entries in group_rows(read_rows, lambda entry: my_int(entry[config.messages_keys['room']])):
+        rooms += 1
 
         # if set([entry[config.messages_keys['translation']] for entry in entries]) == {''}:
         #     # there is no translated entry, no need to do anything, skip this room
@@ -129,10 +103,18 @@ def messages_import(csvdir, input_game_dir, output_game_dir):
         with open(orig_filename, 'rb') as f:
             original = f.read()
 
+        h = get_hash(original, entries)
+        if incremental and is_unchanged(output_game_dir, manifest, filename, h):
+            continue
         content = update_msg(original, entries)
         # assert content == original
         with open(patch_filename, 'wb') as output:
             output.write(content)
+        manifest[filename] = h
+        written += 1
+    # also after a full import, so the next incremental one compares with what was written now
+    save_manifest(csvdir, output_game_dir, manifest)
+    print(f"messages_import: wrote {written} of {rooms} messages files")
 
 
 if __name__ == "__main__":
@@ -141,6 +123,8 @@ if __name__ == "__main__":
     parser.add_argument("csvdir", help=f"directory to read {config.texts_csv_filename} from")
     parser.add_argument("input_game_dir", help="directory containing CLEAN game dir (probably used for 'export_all') - won't be modified")
     parser.add_argument("output_game_dir", help="copy of 'input_game_dir', that will be modified by this script, and manually recompiled in SCICompanion")
+    parser.add_argument("--incremental", "-i", action='store_true',
+                        help="only write the messages files whose rows changed since the last import")
     args = parser.parse_args()
 
-    messages_import(args.csvdir, args.input_game_dir, args.output_game_dir)
+    messages_import(args.csvdir, args.input_game_dir, args.output_game_dir, args.incremental)
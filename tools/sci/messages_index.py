@@ -0,0 +1,143 @@
+# Index of all the messages of a game (one or more versions of it), in an SQLite file
+# built once from the message resources (and optionally the translations csv, see tradusci_export),
+# then queried by message tuple (room, noun, verb, condition, sequence), talker or text, or compared between versions
+# SCI_01 messages have no noun, verb, condition or sequence (all 0), so they're told apart by their index in the file
+
+import argparse
+from collections import Counter
+from contextlib import closing
+import csv
+import sqlite3
+import sys
+
+from sci.tradusci_export import MESSAGE_PATTERNS, SIERRA_CODEPAGE, SCI_01, load_resources, is_message_file, \
+    read_all_messages
+
+TUPLE = ('room', 'noun', 'verb', 'condition', 'sequence')
+# message: the index of the message in its file for SCI_01 files, 0 for the later versions
+KEY = TUPLE + ('message',)
+COLUMNS = ('version', 'file') + KEY + ('talker', 'text', 'translation', 'comment')
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS messages ({', '.join(COLUMNS)});
+CREATE INDEX IF NOT EXISTS messages_tuple ON messages (version, {', '.join(KEY)});
+CREATE INDEX IF NOT EXISTS messages_talker ON messages (version, talker);
+'''
+
+
+def get_room(fname):
+    # 123.msg or message.123
+    return int(fname.stem) if fname.stem.isnumeric() else int(fname.suffix.lstrip('.'))
+
+
+def read_translations(csv_file):
+    # (file, noun, verb, condition, sequence, message) -> translation, from a tradusci_export csv
+    # message: like the message column - the index of the row in its file for SCI_01 files (whose tuples are all 0)
+    translations = {}
+    rows_of_file = Counter()
+    with open(csv_file, newline='', encoding='utf-8', errors='surrogateescape') as f:
+        for row in csv.DictReader(f):
+            message_tuple = (int(row['noun']), int(row['verb']), int(row['condition']), int(row['sequence']))
+            idx = rows_of_file[row['file']]
+            rows_of_file[row['file']] += 1
+            if row['translation']:
+                translations[(row['file'], *message_tuple, idx if not any(message_tuple) else 0)] = row['translation']
+    return translations
+
+
+def build_index(db_file, gamedir, version, csv_file=None, encoding=SIERRA_CODEPAGE, jobs=1):
+    # (re)builds the index of the given version
+    filenames = [fname for fname in load_resources(gamedir, patterns=MESSAGE_PATTERNS) if is_message_file(fname)]
+    translations = read_translations(csv_file) if csv_file else {}
+    encoding = {'encoding': encoding, 'errors': 'surrogateescape'}
+
+    with closing(sqlite3.connect(db_file)) as db, db:
+        db.executescript(SCHEMA)
+        db.execute('DELETE FROM messages WHERE version = ?', (version,))
+        for fname, (header, rows) in zip(filenames, read_all_messages(gamedir, filenames, encoding, jobs)):
+            room = get_room(fname)
+            indexed = header[0] & 0xFFFFFF00 == SCI_01
+            rows = [(idx if indexed else 0, *row) for idx, row in enumerate(rows)]
+            db.executemany(f'INSERT INTO messages VALUES ({", ".join("?" * len(COLUMNS))})', [
+                (version, name, room, noun, verb, condition, sequence, message, talker, text,
+                 translation or translations.get((name, noun, verb, condition, sequence, message), ''), comment_text)
+                for message, name, noun, verb, condition, sequence, talker, _, text, translation, _, comment_text
+                in rows])
+        return db.execute('SELECT COUNT(*) FROM messages WHERE version = ?', (version,)).fetchone()[0]
+
+
+def find_messages(db_file, version, text=None, **fields):
+    # fields: any of TUPLE and talker; text: a substring of the text or the translation
+    conditions = ['version = ?']
+    values = [version]
+    for key, value in fields.items():
+        assert key in TUPLE + ('talker',), key
+        if value is not None:
+            conditions.append(f'{key} = ?')
+            values.append(value)
+    if text is not None:
+        conditions.append("(instr(text, ?) OR instr(translation, ?))")
+        values += [text, text]
+    with closing(sqlite3.connect(db_file)) as db:
+        return db.execute(f'SELECT * FROM messages WHERE {" AND ".join(conditions)} '
+                          f'ORDER BY {", ".join(KEY)}', values).fetchall()
+
+
+def diff_versions(db_file, old, new):
+    # (kind, key, old text, new text) of every message added, removed or changed between the versions,
+    # key: the tuple and the index of the message (see KEY)
+    key = ' AND '.join(f'a.{column} = b.{column}' for column in KEY)
+    select = f'SELECT {", ".join("a." + column for column in KEY)}, '
+    with closing(sqlite3.connect(db_file)) as db:
+        removed = db.execute(select + f"a.text, NULL FROM messages a WHERE a.version = ? AND NOT EXISTS "
+                             f"(SELECT 1 FROM messages b WHERE b.version = ? AND {key})", (old, new)).fetchall()
+        added = db.execute(select + f"NULL, a.text FROM messages a WHERE a.version = ? AND NOT EXISTS "
+                           f"(SELECT 1 FROM messages b WHERE b.version = ? AND {key})", (new, old)).fetchall()
+        changed = db.execute(select + f"a.text, b.text FROM messages a JOIN messages b ON {key} "
+                             f"WHERE a.version = ? AND b.version = ? AND a.text != b.text", (old, new)).fetchall()
+    size = len(KEY)
+    diff = [('removed', row[:size], row[size], row[size + 1]) for row in removed]
+    diff += [('added', row[:size], row[size], row[size + 1]) for row in added]
+    diff += [('changed', row[:size], row[size], row[size + 1]) for row in changed]
+    return sorted(diff, key=lambda d: d[1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Builds and queries an index (SQLite) of the messages of a game',
+    )
+    parser.add_argument('db', help='index file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='index the messages of a game version')
+    build_parser.add_argument('gamedir', help='directory containing the game files')
+    build_parser.add_argument('-v', '--version', default='default', help='name of the game version')
+    build_parser.add_argument('-c', '--csv', help='translations csv (see tradusci_export)')
+    build_parser.add_argument('-e', '--encoding', default=SIERRA_CODEPAGE, help='codepage to decode the messages')
+    build_parser.add_argument('-j', '--jobs', type=int, default=1,
+                              help='number of processes to read the messages files with (0 - as many as CPUs)')
+
+    find_parser = subparsers.add_parser('find', help='find messages')
+    find_parser.add_argument('-v', '--version', default='default', help='name of the game version')
+    for field in TUPLE + ('talker',):
+        find_parser.add_argument(f'--{field}', type=int)
+    find_parser.add_argument('-t', '--text', help='substring of the text or the translation')
+
+    diff_parser = subparsers.add_parser('diff', help='messages added, removed or changed between two versions')
+    diff_parser.add_argument('old', help='name of the old game version')
+    diff_parser.add_argument('new', help='name of the new game version')
+
+    args = parser.parse_args()
+
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    if args.command == 'build':
+        count = build_index(args.db, args.gamedir, args.version, args.csv, args.encoding, args.jobs or None)
+        print(f'Indexed {count} messages of {args.version}', file=sys.stderr)
+    elif args.command == 'find':
+        writer.writerow(COLUMNS)
+        writer.writerows(find_messages(args.db, args.version, args.text,
+                                       **{field: getattr(args, field) for field in TUPLE + ('talker',)}))
+    else:
+        writer.writerow(('kind',) + KEY + ('old', 'new'))
+        writer.writerows((kind, *key, old, new) for kind, key, old, new in diff_versions(args.db, args.old, args.new))
@@ -0,0 +1,146 @@
+# Exports the messages of a voice-capable game (SCI1.1 and later) together with their voices:
+# every message tuple (room, noun, verb, condition, sequence) is looked up in the audio maps of its room,
+# giving the offset and the size of its audio36 resource (and its sync36, if any) in RESOURCE.AUD
+# based on ScummVM resource_audio.cpp
+#    int ResourceManager::readAudioMapSCI11(IntMapResourceSource *map)
+
+import argparse
+from contextlib import nullcontext
+import csv
+import struct
+import sys
+from pathlib import Path
+
+from sci.messages_index import get_room
+from sci.tradusci_export import MESSAGE_PATTERNS, SIERRA_CODEPAGE, load_resources, is_message_file, \
+    read_all_messages
+
+MAP_PATTERNS = ["*.map", "*.MAP"]
+RES_AUD_NAME = 'RESOURCE.AUD'
+MAP_FILE_HEADER = b'\x90\x00'
+END_OF_MAP = 0xFF
+SYNC_FLAG = 0x80
+RAVE_FLAG = 0x40
+SIERRA_AUDIO_TYPE = 0x8D
+
+# noun, verb, condition, sequence (and flags), offset delta (24 bits)
+MAP_ENTRY = struct.Struct('<BBBB3s')
+# the early format (no base offset): noun, verb, condition, sequence (and flags), offset, sync size (always there)
+# and a byte which isn't used; the map ends with a whole entry of 0xFF
+EARLY_MAP_ENTRY = struct.Struct('<BBBBIHx')
+END_OF_EARLY_MAP = bytes([END_OF_MAP]) * EARLY_MAP_ENTRY.size
+UINT16LE = struct.Struct('<H')
+UINT32LE = struct.Struct('<I')
+
+COLUMNS = ('file', 'room', 'noun', 'verb', 'condition', 'sequence', 'talker', 'text', 'audio_offset', 'audio_size',
+           'sync_offset', 'sync_size')
+
+
+def is_early_map(data):
+    # like ScummVM, by the number of 0xFF bytes the map ends with
+    return len(data) - len(data.rstrip(bytes([END_OF_MAP]))) == len(END_OF_EARLY_MAP)
+
+
+def parse_early_map(data, room):
+    pos = 2
+    while data[pos:pos + len(END_OF_EARLY_MAP)] != END_OF_EARLY_MAP:
+        noun, verb, condition, sequence, offset, sync_size = EARLY_MAP_ENTRY.unpack_from(data, pos)
+        pos += EARLY_MAP_ENTRY.size
+        yield (room, noun, verb, condition, sequence & ~(SYNC_FLAG | RAVE_FLAG)), (offset, sync_size, 0)
+
+
+def parse_map(data, room, kq6=False):
+    # yields ((room, noun, verb, condition, sequence), (offset, sync size, rave size)) for each entry of an audio map
+    # kq6: RAVE_FLAG marks a rave (lip sync) size after the sync size - only in KQ6, in other games
+    # (e.g. Laura Bow 2 CD) the flag is set without it
+    assert data[:2] == MAP_FILE_HEADER, data[:2]
+    if is_early_map(data):
+        yield from parse_early_map(data, room)
+        return
+    offset = UINT32LE.unpack_from(data, 2)[0]
+    pos = 6
+    while pos < len(data) and data[pos + 3] != END_OF_MAP:
+        noun, verb, condition, sequence, delta = MAP_ENTRY.unpack_from(data, pos)
+        pos += MAP_ENTRY.size
+        offset += int.from_bytes(delta, 'little')
+        sync_size = rave_size = 0
+        if sequence & SYNC_FLAG:
+            sync_size = UINT16LE.unpack_from(data, pos)[0]
+            pos += UINT16LE.size
+        if kq6 and sequence & RAVE_FLAG:
+            rave_size = UINT16LE.unpack_from(data, pos)[0]
+            pos += UINT16LE.size
+        yield (room, noun, verb, condition, sequence & ~(SYNC_FLAG | RAVE_FLAG)), (offset, sync_size, rave_size)
+
+
+def is_room_map(fname):
+    # 65535.map is the map of the sound effects, which aren't tied to messages
+    return fname.stem.isnumeric() and int(fname.stem) != 65535
+
+
+def index_maps(gamedir, kq6=False):
+    # (room, noun, verb, condition, sequence) -> (offset, sync size, rave size), of all the audio maps of the game
+    index = {}
+    for fname in load_resources(gamedir, patterns=MAP_PATTERNS):
+        if is_room_map(fname):
+            index.update(parse_map(fname.read_bytes(), int(fname.stem), kq6))
+    return index
+
+
+def get_audio_size(header):
+    # the size of the audio resource (including its header), from its first bytes
+    if header[:4] == b'RIFF':
+        return UINT32LE.unpack_from(header, 4)[0] + 8
+    assert header[0] == SIERRA_AUDIO_TYPE, header[0]
+    header_size = header[1]
+    assert header[2:5] == b'SOL', header[2:6]
+    return UINT32LE.unpack_from(header, 9)[0] + header_size + 2
+
+
+def export_voices(gamedir, output, encoding=SIERRA_CODEPAGE, jobs=1, kq6=False):
+    gamedir = Path(gamedir)
+    filenames = [fname for fname in load_resources(gamedir, patterns=MESSAGE_PATTERNS) if is_message_file(fname)]
+    encoding = {'encoding': encoding, 'errors': 'surrogateescape'}
+    voices = index_maps(gamedir, kq6)
+
+    aud_file = gamedir / RES_AUD_NAME
+    if not aud_file.exists():
+        print(f'WARNING: {RES_AUD_NAME} was not found, the sizes of the voices are not exported')
+    found = 0
+    with open(output, 'w', encoding='utf-8', errors='surrogateescape') as out, \
+            (aud_file.open('rb') if aud_file.exists() else nullcontext()) as aud:
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(COLUMNS)
+        for fname, (_, rows) in zip(filenames, read_all_messages(gamedir, filenames, encoding, jobs)):
+            room = get_room(fname)
+            for name, noun, verb, condition, sequence, talker, _, text, *_ in rows:
+                voice = voices.get((room, noun, verb, condition, sequence))
+                audio = ('', '', '', '')
+                if voice:
+                    found += 1
+                    offset, sync_size, rave_size = voice
+                    audio_offset = offset + sync_size + rave_size
+                    audio_size = ''
+                    if aud:
+                        aud.seek(audio_offset)
+                        audio_size = get_audio_size(aud.read(13))
+                    audio = (audio_offset, audio_size, offset if sync_size else '', sync_size or '')
+                writer.writerow((name, room, noun, verb, condition, sequence, talker, text, *audio))
+    return found, len(voices)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Exports the messages of a game with the offsets and sizes of their voices in RESOURCE.AUD',
+    )
+    parser.add_argument('gamedir', help='directory containing the game files')
+    parser.add_argument('-o', '--output', default='voices.csv', help='csv file to export the messages to')
+    parser.add_argument('-e', '--encoding', default=SIERRA_CODEPAGE, help='codepage to decode the messages')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of processes to read the messages files with (0 - as many as CPUs)')
+    parser.add_argument('--kq6', action='store_true', help="the audio maps have rave sizes (King's Quest VI)")
+    args = parser.parse_args()
+
+    found, total = export_voices(args.gamedir, args.output, args.encoding, args.jobs or None, args.kq6)
+    print(f'{found} messages have voices ({total} voices in the audio maps)', file=sys.stderr)
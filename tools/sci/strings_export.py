@@ -5,31 +5,51 @@ import csv
 from pathlib import Path
 
 from config import scripts_strings_csv_filename, scripts_strings_keys
+from assembler.asm_lib.disasm_model import load_model
 
 
-def strings_export(asm_path, csvdir):
-    if not asm_path.exists():
-        print(f"ERROR: strings_export: {asm_path} doesn't exist")
+def read_strings_tables(asm_path, gamedir=None):
+    # same as script_disasm.get_strings_table, from the assembly (.sca) files
+    # or from the disassembly models, if gamedir is given and they are up to date with its scripts
+    for filename in asm_path.glob('*.sca'):
+        if gamedir is not None and (Path(gamedir) / f'{filename.stem}.scr').exists():
+            model = load_model(asm_path, Path(gamedir) / f'{filename.stem}.scr')
+            if model is not None:
+                yield filename.stem, model['strings']
+                continue
+        text = filename.read_text().splitlines()
+
+        entries = [l for l in text if l.startswith('string_')]
+        strings = []
+        for entry in entries:
+            if entry.strip():
+                s = re.split('(.*): "(.*)"', entry)
+                assert len(s) == 4
+                assert s[3].endswith('; special') or s[0] == s[3] == ''
+                strings.append({'id': s[1], 'str': s[2], 'special': entry.endswith('; special'),
+                                'used': not entry.startswith('string_unused_')})
+        yield filename.stem, strings
+
+
+def strings_export(asm_path, csvdir, strings_tables=None, gamedir=None):
+    # strings_tables: (script name, strings table) pairs, e.g. from script_disasm.disasm_all_iter
+    # if not given, they are read from the assembly (.sca) files in asm_path (see read_strings_tables)
+    if strings_tables is None:
+        if not asm_path.exists():
+            print(f"ERROR: strings_export: {asm_path} doesn't exist")
+        strings_tables = read_strings_tables(asm_path, gamedir)
 
     with open(os.path.join(csvdir, scripts_strings_csv_filename), 'w', newline='', encoding='UTF-8') as output_file:
         dict_writer = csv.DictWriter(output_file, fieldnames=scripts_strings_keys.values(), quoting=csv.QUOTE_ALL)
         dict_writer.writeheader()
 
-        for filename in asm_path.glob('*.sca'):
-            text = filename.read_text().splitlines()
-
-            entries = [l for l in text if l.startswith('string_')]
-            entries = [e for e in entries if not e.endswith('; special') and not e.startswith('string_unused_')]
-
-            for entry in entries:
-                if entry.strip():
-                    s = re.split('(.*): "(.*)"', entry)
-                    assert len(s) == 4
-                    assert s[0] == s[3] == ''
+        for name, strings in strings_tables:
+            for s in strings:
+                if s['used'] and not s['special']:
                     dict_writer.writerow({
-                        scripts_strings_keys['filename']: filename.stem,
-                        scripts_strings_keys['idx']: s[1],
-                        scripts_strings_keys['original']: s[2].replace(r'\"', '"')
+                        scripts_strings_keys['filename']: name,
+                        scripts_strings_keys['idx']: s['id'],
+                        scripts_strings_keys['original']: s['str'].replace(r'\"', '"')
                     })
 
 
@@ -43,6 +63,8 @@ This exports all these messages to a csv file, to be translated.
     parser.add_argument("asmdir",
                         help="src directory containing the assembly (.sca) files (created by disassembling the .scr files)")
     parser.add_argument("csvdir", help="directory to write .csv file, and intermediate assembly (.sca) files")
+    parser.add_argument("--gamedir", help="directory containing the scripts (.scr) the assembly was made from - "
+                                          "to use the disassembly models (.model) instead of parsing the .sca files")
     args = parser.parse_args()
 
-    strings_export(Path(args.asmdir), args.csvdir)
+    strings_export(Path(args.asmdir), args.csvdir, gamedir=args.gamedir)
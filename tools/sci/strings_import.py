@@ -4,9 +4,13 @@ import argparse
 import os
 import csv
 import shutil
+import sys
+from collections import defaultdict
 from pathlib import Path
 
 import config
+import assembler.script_asm
+import assembler.script_patch
 
 ENCODING = 'UTF-8'
 
@@ -15,52 +19,115 @@ def escape_string(s):
     return s.replace('"', '\\"')
 
 
-def check_replace(filename, lines, index, s_from, s_to):
-    matches = [(i, l) for i, l in enumerate(lines) if l.startswith(f'{index}: "{escape_string(s_from)}"')]
-    if len(matches) != 1:
+def get_strings_lines(lines):
+    # string id -> index of its line (None if it appears more than once)
+    strings_lines = {}
+    for i, l in enumerate(lines):
+        if l.startswith('string_'):
+            index = l.split(':', 1)[0]
+            strings_lines[index] = None if index in strings_lines else i
+    return strings_lines
+
+
+def check_replace(filename, lines, strings_lines, index, s_from, s_to):
+    # the whole string, with its closing quote (and the rest of the line, e.g. a comment, is kept)
+    prefix = f'{index}: "{escape_string(s_from)}"'
+    i = strings_lines.get(index)
+    if i is None or not lines[i].startswith(prefix):
         print(f"WARNING: ({index} of {filename}) failed to replace '{s_from}' to '{s_to}' ")
         return lines
     else:
-        i, l = matches[0]
-        lines[i] = l.replace(escape_string(s_from), escape_string(s_to))
+        lines[i] = f'{index}: "{escape_string(s_to)}"' + lines[i][len(prefix):]
         return lines
 
 
-def strings_import(csvdir):
-    orig_asm_path = Path(csvdir) / 'asm' / 'orig'
-    modified_asm_path = Path(csvdir) / 'asm' / 'modified'
-    shutil.rmtree(modified_asm_path, ignore_errors=True)
-    modified_asm_path.mkdir()
-    shutil.copyfile(orig_asm_path / 'kernels.csv', modified_asm_path / 'kernels.csv')
-
+def read_texts(csvdir):
+    texts = defaultdict(list)
     with open(os.path.join(csvdir, config.scripts_strings_csv_filename), newline='', encoding='utf-8') as csvfile:
-        texts = [{k: v for k, v in row.items()}
-                 for row in csv.DictReader(csvfile, skipinitialspace=True)]
-    filenames = sorted(list(set([entry[config.scripts_strings_keys['filename']] for entry in texts])))
-    for file_index in filenames:
-        entries = [entry for entry in texts if entry[config.scripts_strings_keys['filename']] == file_index]
+        for row in csv.DictReader(csvfile, skipinitialspace=True):
+            texts[row[config.scripts_strings_keys['filename']]].append(row)
+    for file_index in sorted(texts):
+        entries = texts[file_index]
 
         if set([entry[config.scripts_strings_keys['translation']] for entry in entries]) == {''}:
             # there is no translated entry, no need to change anything
             continue
+        yield int(float(file_index)), entries
+
 
-        filename = f"{int(float(file_index))}.sca"
+def strings_import(csvdir, check=False, files=None):
+    # with check, nothing is written - only reports the sizes of the modified scripts, and returns the too big ones
+    # files: only these scripts (by number) are modified, e.g. the ones strings_import_binary couldn't patch
+    orig_asm_path = Path(csvdir) / 'asm' / 'orig'
+    modified_asm_path = Path(csvdir) / 'asm' / 'modified'
+    too_big = []
+    if not check:
+        shutil.rmtree(modified_asm_path, ignore_errors=True)
+        modified_asm_path.mkdir()
+        shutil.copyfile(orig_asm_path / 'kernels.csv', modified_asm_path / 'kernels.csv')
+
+    for file_index, entries in read_texts(csvdir):
+        if files is not None and file_index not in files:
+            continue
+        filename = f"{file_index}.sca"
         asm = (orig_asm_path / filename).read_text(encoding=ENCODING).splitlines()
+        strings_lines = get_strings_lines(asm)
 
         for entry in entries:
             if entry[config.scripts_strings_keys['translation']]:
-                asm = check_replace(filename, asm,
+                asm = check_replace(filename, asm, strings_lines,
                                     entry[config.scripts_strings_keys['idx']],
                                     entry[config.scripts_strings_keys['original']],
                                     entry[config.scripts_strings_keys['translation']])
 
-        (modified_asm_path / filename).write_text('\n'.join(asm), encoding=ENCODING)
+        if check:
+            analysis = assembler.script_asm.analyze('\n'.join(asm))
+            assembler.script_asm.print_analysis(filename, analysis)
+            if analysis['headroom'] < 0:
+                too_big.append(filename)
+        else:
+            (modified_asm_path / filename).write_text('\n'.join(asm), encoding=ENCODING)
+    return too_big
+
+
+def strings_import_binary(csvdir, gamedir, patches_dir):
+    # patches the compiled scripts directly, instead of changing their disassembly and assembling it
+    # returns the scripts (by number) which can't be patched (see script_patch.is_patchable) - assemble them instead
+    unpatched = []
+    for file_index, entries in read_texts(csvdir):
+        translations = {entry[config.scripts_strings_keys['idx']]: (entry[config.scripts_strings_keys['original']],
+                                                                    entry[config.scripts_strings_keys['translation']])
+                        for entry in entries if entry[config.scripts_strings_keys['translation']]}
+        filename = f"{file_index}.scr"
+        if not assembler.script_patch.can_patch(Path(gamedir) / filename):
+            print(f"WARNING: {filename} can't be patched, its strings should be imported by assembling it")
+            unpatched.append(file_index)
+            continue
+        result = assembler.script_patch.patch_strings(Path(gamedir) / filename, translations)
+        (Path(patches_dir) / filename).write_bytes(result)
+    return unpatched
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
                                      description="Imports scripts' strings from csv file", )
     parser.add_argument("csvdir", help=f"directory to read {config.scripts_strings_csv_filename} from")
+    parser.add_argument("--gamedir", help="directory containing the compiled scripts (.scr) - patch them directly, "
+                                          "instead of writing modified assembly (.sca) files")
+    parser.add_argument("--patches_dir", help="directory to write the patched scripts to (with --gamedir)")
+    parser.add_argument("--check", action='store_true',
+                        help="don't write anything, only report scripts that would be too big with the translations")
     args = parser.parse_args()
 
-    strings_import(args.csvdir)
+    if args.check:
+        too_big = strings_import(args.csvdir, check=True)
+        if too_big:
+            print(f"ERROR: too big scripts: {', '.join(too_big)}")
+            sys.exit(1)
+    elif args.gamedir:
+        unpatched = strings_import_binary(args.csvdir, args.gamedir, args.patches_dir)
+        if unpatched:
+            # the rest are imported to the disassembly, to be assembled
+            strings_import(args.csvdir, files=unpatched)
+    else:
+        strings_import(args.csvdir)
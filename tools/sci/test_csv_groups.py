@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.csv_groups import group_rows
+
+
+def get_groups(rows):
+    return [(key, [row['i'] for row in group]) for key, group in group_rows(lambda: iter(rows), lambda row: row['file'])]
+
+
+def test_consecutive():
+    rows = [{'file': f, 'i': i} for i, f in enumerate(['b', 'b', '', 'a', 'c', 'c'])]
+    assert get_groups(rows) == [('b', [0, 1]), ('a', [3]), ('c', [4, 5])]
+
+
+def test_not_consecutive(capsys):
+    rows = [{'file': f, 'i': i} for i, f in enumerate(['b', 'a', 'b', 'a'])]
+    assert get_groups(rows) == [('a', [1, 3]), ('b', [0, 2])]
+    assert 'WARNING' in capsys.readouterr().out
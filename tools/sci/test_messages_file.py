@@ -0,0 +1,81 @@
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci import config
+from sci import messages_file
+from sci.messages_file import ENTRY_FORMATS, SIERRA_MESSAGE_HEADER, get_kind, parse_msg, get_hash, load_manifest, \
+    save_manifest, MANIFEST_FILE
+from sci.messages_import import update_msg
+
+TEXTS = ['Hello', '', 'two\r\nlines', 'caf\x82 "quoted"']
+# a version of each kind, and the bytes between the version and the number of messages
+VERSIONS = {'lame': (0x800, b'\0\0'), 'ok': (0xd00, b'\0\0\0\0'), 'best': (0xf00, b'\0\0\0\0\0\0')}
+
+
+def make_msg(kind):
+    # the strings are followed by bytes (e.g. comments) which should be kept as is
+    version, pad = VERSIONS[kind]
+    entry_format = ENTRY_FORMATS[kind]
+    index = 2 + len(pad) + 2
+    offset = index + entry_format.size * len(TEXTS)
+    table = b''
+    for i, text in enumerate(TEXTS):
+        if kind == 'lame':
+            table += entry_format.pack(i, 1, offset)
+        else:
+            table += entry_format.pack(i, 1, 2, 1, 99, offset, b'\xaa' * (entry_format.size - 7))
+        offset += len(text) + 1
+    strings = b''.join(text.encode('latin-1') + b'\0' for text in TEXTS)
+    return SIERRA_MESSAGE_HEADER + struct.pack('<H', version) + pad + struct.pack('<H', len(TEXTS)) + table + \
+        strings + b'\x01\x02tail'
+
+
+def get_rows(entries, translations):
+    rows = []
+    for entry, translation in zip(entries, translations):
+        row = {config.messages_keys[key]: str(value) for key, value in entry.items() if key in config.messages_keys}
+        row[config.messages_keys['translation']] = translation
+        rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize('kind', ['lame', 'ok', 'best'])
+def test_round_trip(kind):
+    data = make_msg(kind)
+    parsed_kind, _, entries = parse_msg(data)
+    assert parsed_kind == kind == get_kind(VERSIONS[kind][0])
+    assert [entry['original'] for entry in entries] == [text.encode('latin-1').decode('CP437') for text in TEXTS]
+    assert [entry['noun'] for entry in entries] == list(range(len(TEXTS)))
+    if kind != 'lame':
+        assert {(entry['condition'], entry['sequence'], entry['talker']) for entry in entries} == {(2, 1, 99)}
+        assert {entry['padding'] for entry in entries} == {'aa' * (ENTRY_FORMATS[kind].size - 7)}
+
+    assert update_msg(data, get_rows(entries, [''] * len(TEXTS))) == data
+
+    translations = ['Shalom', 'New', '', 'a longer translation']
+    updated = update_msg(data, get_rows(entries, translations))
+    assert updated.endswith(b'\x01\x02tail')
+    updated_kind, _, updated_entries = parse_msg(updated)
+    assert updated_kind == kind
+    assert [entry['original'] for entry in updated_entries] == [translation or entry['original'] for
+                                                                translation, entry in zip(translations, entries)]
+    assert [{k: v for k, v in entry.items() if k not in ('offset', 'original')} for entry in updated_entries] == \
+        [{k: v for k, v in entry.items() if k not in ('offset', 'original')} for entry in entries]
+
+
+def test_manifest(tmp_path, monkeypatch):
+    target = tmp_path / 'PATCHES'
+    target.mkdir()
+    h = get_hash(b'original', [{'row': 1}])
+    save_manifest(tmp_path, target, {'1.msg': h})
+    assert not (target / MANIFEST_FILE).exists()
+    assert load_manifest(tmp_path, target) == {'1.msg': h}
+    # of another target
+    assert load_manifest(tmp_path, tmp_path) == {}
+    # the written files may differ after a new version
+    monkeypatch.setattr(messages_file, 'MANIFEST_VERSION', messages_file.MANIFEST_VERSION + 1)
+    assert get_hash(b'original', [{'row': 1}]) != h
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.tradusci_export import MessageHeader, SCI_01, SCI_05
+from sci.tradusci_import import save_msg_file
+from sci.messages_index import build_index, find_messages, diff_versions
+
+
+def write_messages(path, texts):
+    lines = [{'noun': str(noun), 'verb': '1', 'condition': '0', 'sequence': '1', 'talker': str(talker),
+              'padding': '00000000', 'text': text, 'translation': '', 'comment_padding': '', 'comment_text': ''}
+             for noun, talker, text in texts]
+    path.write_bytes(save_msg_file(MessageHeader(SCI_05, None, len(lines), len(lines)), lines))
+
+
+def test_index(tmp_path):
+    for version in ['v1', 'v2']:
+        (tmp_path / version).mkdir()
+    write_messages(tmp_path / 'v1' / '10.msg', [(1, 5, 'Hello there'), (2, 6, 'Bye')])
+    write_messages(tmp_path / 'v1' / '11.msg', [(1, 5, 'Other room')])
+    write_messages(tmp_path / 'v2' / '10.msg', [(1, 5, 'Hello there'), (2, 6, 'Goodbye'), (3, 6, 'New')])
+    (tmp_path / 'v1.csv').write_text('file,noun,verb,condition,sequence,translation\n10.msg,2,1,0,1,Shalom\n')
+    db = tmp_path / 'messages.db'
+
+    assert build_index(db, tmp_path / 'v1', 'v1', tmp_path / 'v1.csv') == 3
+    assert build_index(db, tmp_path / 'v2', 'v2') == 3
+    # rebuilding replaces the version
+    assert build_index(db, tmp_path / 'v2', 'v2') == 3
+
+    assert [row[9:] for row in find_messages(db, 'v1', room=10, noun=2)] == [('Bye', 'Shalom', '')]
+    assert [row[9] for row in find_messages(db, 'v1', talker=5)] == ['Hello there', 'Other room']
+    assert [row[9] for row in find_messages(db, 'v1', 'hal')] == ['Bye']
+    assert [row[9] for row in find_messages(db, 'v2', 'e', verb=1)] == ['Hello there', 'Goodbye', 'New']
+
+    assert diff_versions(db, 'v1', 'v2') == [
+        ('changed', (10, 2, 1, 0, 1, 0), 'Bye', 'Goodbye'),
+        ('added', (10, 3, 1, 0, 1, 0), None, 'New'),
+        ('removed', (11, 1, 1, 0, 1, 0), 'Other room', None),
+    ]
+
+
+def test_diff_sci01(tmp_path):
+    # every message of an SCI_01 file has the tuple (room, 0, 0, 0, 0)
+    for version, texts in [('v1', ['Hello', 'Bye']), ('v2', ['Hello', 'Goodbye', 'New'])]:
+        (tmp_path / version).mkdir()
+        lines = [{'noun': '0', 'verb': '0', 'condition': '0', 'sequence': '0', 'talker': '5', 'padding': '00',
+                  'text': text, 'translation': '', 'comment_padding': '', 'comment_text': ''} for text in texts]
+        (tmp_path / version / '10.msg').write_bytes(save_msg_file(MessageHeader(SCI_01, None, None, len(lines)),
+                                                                  lines))
+    # translations are matched by the order of the rows in the file
+    (tmp_path / 'v2.csv').write_text('file,noun,verb,condition,sequence,translation\n'
+                                     '10.msg,0,0,0,0,\n10.msg,0,0,0,0,Lehitraot\n10.msg,0,0,0,0,\n')
+    db = tmp_path / 'messages.db'
+    assert build_index(db, tmp_path / 'v1', 'v1') == 2
+    assert build_index(db, tmp_path / 'v2', 'v2', tmp_path / 'v2.csv') == 3
+    assert [row[9:11] for row in find_messages(db, 'v2')] == [('Hello', ''), ('Goodbye', 'Lehitraot'), ('New', '')]
+
+    assert diff_versions(db, 'v1', 'v2') == [
+        ('changed', (10, 0, 0, 0, 0, 1), 'Bye', 'Goodbye'),
+        ('added', (10, 0, 0, 0, 0, 2), None, 'New'),
+    ]
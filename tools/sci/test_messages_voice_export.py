@@ -0,0 +1,73 @@
+import csv
+import struct
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.tradusci_export import MessageHeader, SCI_05
+from sci.tradusci_import import save_msg_file
+from sci.messages_voice_export import MAP_FILE_HEADER, SYNC_FLAG, RAVE_FLAG, export_voices, index_maps, \
+    parse_map
+
+
+def write_messages(path, nouns):
+    lines = [{'noun': str(noun), 'verb': '1', 'condition': '0', 'sequence': '1', 'talker': '5',
+              'padding': '00000000', 'text': f'noun {noun}', 'translation': '', 'comment_padding': '',
+              'comment_text': ''} for noun in nouns]
+    path.write_bytes(save_msg_file(MessageHeader(SCI_05, None, len(lines), len(lines)), lines))
+
+
+def sol(size):
+    # type, header size, header (with a padding byte), data
+    return b'\x8d\x0cSOL\0' + struct.pack('<HBIx', 22050, 0, size) + bytes(size)
+
+
+def test_export(tmp_path):
+    write_messages(tmp_path / '10.msg', [1, 2, 3])
+    write_messages(tmp_path / '11.msg', [1])
+    aud = sol(100) + bytes(8) + sol(50) + sol(20)
+    data = MAP_FILE_HEADER + struct.pack('<I', 0)
+    # noun 1 at 0, noun 3 (with 8 bytes of sync) at 114, room 11 noun 1 at 114 + 8 + 64
+    data += bytes([1, 1, 0, 1]) + (0).to_bytes(3, 'little')
+    data += bytes([3, 1, 0, 1 | SYNC_FLAG]) + (114).to_bytes(3, 'little') + struct.pack('<H', 8)
+    (tmp_path / '10.map').write_bytes(data + b'\xff' * 7)
+    (tmp_path / '11.MAP').write_bytes(MAP_FILE_HEADER + struct.pack('<I', 186) + bytes([1, 1, 0, 1])
+                                      + (0).to_bytes(3, 'little') + b'\xff' * 7)
+    (tmp_path / 'RESOURCE.AUD').write_bytes(aud)
+
+    assert index_maps(tmp_path) == {
+        (10, 1, 1, 0, 1): (0, 0, 0),
+        (10, 3, 1, 0, 1): (114, 8, 0),
+        (11, 1, 1, 0, 1): (186, 0, 0),
+    }
+    assert export_voices(tmp_path, tmp_path / 'voices.csv') == (3, 3)
+    with open(tmp_path / 'voices.csv', newline='') as f:
+        rows = [(row['file'], row['noun'], row['audio_offset'], row['audio_size'], row['sync_offset'],
+                 row['sync_size']) for row in csv.DictReader(f)]
+    assert rows == [
+        ('10.msg', '1', '0', '114', '', ''),
+        ('10.msg', '2', '', '', '', ''),
+        ('10.msg', '3', '122', '64', '114', '8'),
+        ('11.msg', '1', '186', '34', '', ''),
+    ]
+
+
+def test_rave():
+    data = MAP_FILE_HEADER + struct.pack('<I', 10)
+    data += bytes([1, 1, 0, 1 | SYNC_FLAG | RAVE_FLAG]) + (4).to_bytes(3, 'little') + struct.pack('<HH', 8, 6)
+    data += b'\xff' * 7
+    # the rave size is only read in KQ6
+    assert list(parse_map(data, 10, kq6=True)) == [((10, 1, 1, 0, 1), (14, 8, 6))]
+    data = MAP_FILE_HEADER + struct.pack('<I', 10)
+    data += bytes([1, 1, 0, 1 | RAVE_FLAG]) + (4).to_bytes(3, 'little')
+    data += bytes([2, 1, 0, 1]) + (20).to_bytes(3, 'little') + b'\xff' * 7
+    assert list(parse_map(data, 10)) == [((10, 1, 1, 0, 1), (14, 0, 0)), ((10, 2, 1, 0, 1), (34, 0, 0))]
+
+
+def test_early_map():
+    # absolute offsets, the sync size is always there, and the map ends with 11 bytes of 0xFF
+    data = MAP_FILE_HEADER
+    data += bytes([1, 1, 0, 1]) + struct.pack('<IHx', 0, 0)
+    data += bytes([3, 1, 0, 1 | SYNC_FLAG]) + struct.pack('<IHx', 114, 8)
+    data += b'\xff' * 11
+    assert list(parse_map(data, 10)) == [((10, 1, 1, 0, 1), (0, 0, 0)), ((10, 3, 1, 0, 1), (114, 8, 0))]
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.strings_import import get_strings_lines, check_replace
+
+LINES = [
+    'string_3: "Hello world"',
+    'string_4: "Say \\"hi\\""\t\t ; special',
+    'string_5: "x"',
+    'string_5: "y"',
+]
+
+
+def replace(index, s_from, s_to):
+    return check_replace('1.sca', list(LINES), get_strings_lines(LINES), index, s_from, s_to)
+
+
+def test_replace():
+    assert replace('string_3', 'Hello world', 'Shalom')[0] == 'string_3: "Shalom"'
+    assert replace('string_4', 'Say "hi"', 'Shalom')[1] == 'string_4: "Shalom"\t\t ; special'
+
+
+def test_not_replaced(capsys):
+    # only the start of the string
+    assert replace('string_3', 'Hello', 'Shalom') == LINES
+    # not the original
+    assert replace('string_3', 'Goodbye world', 'Shalom') == LINES
+    # ambiguous or missing string id
+    assert replace('string_5', 'x', 'Shalom') == LINES
+    assert replace('string_6', 'x', 'Shalom') == LINES
+    assert capsys.readouterr().out.count('WARNING') == 4
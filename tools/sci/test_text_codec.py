@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.text_codec import SIERRA_CODEPAGE, decode, encode, read_cstring, split_cstrings
+from sci.texts_export import texts_export
+from sci.texts_import import texts_import
+
+
+def test_round_trip():
+    data = bytes(range(256))
+    assert encode(decode(data), SIERRA_CODEPAGE) == data
+    # bytes which aren't defined in windows-1255 survive too
+    assert encode(decode(data, 'windows-1255')) == data
+    assert encode('שלום') == 'שלום'.encode('windows-1255')
+
+
+def test_cstrings():
+    data = b'\x83\0Hello\0\0last'
+    assert read_cstring(data, 2) == (b'Hello', 8)
+    assert read_cstring(data, 8) == (b'', 9)
+    assert split_cstrings(data) == [b'\x83', b'Hello', b'']
+
+
+def test_csv_round_trip(tmp_path):
+    # 0x81 isn't defined in windows-1252 (the texts) nor in windows-1255 (the translations)
+    (tmp_path / 'game').mkdir()
+    (tmp_path / 'game' / 'text.001').write_bytes(b'\x83\0Hello\0odd \x81\0')
+    texts_export(tmp_path / 'game', tmp_path)
+    csv_file = tmp_path / 'texts.csv'
+    csv_file.write_bytes(csv_file.read_bytes().replace(b'Hello,', b'Hello,Shalom'))
+    texts_import(tmp_path, tmp_path)
+    assert (tmp_path / 'text.001').read_bytes() == b'\x83\0Shalom\0odd \x81\0'
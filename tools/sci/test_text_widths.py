@@ -0,0 +1,70 @@
+import struct
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.misc.fontlib import SIERRA_FONT_HEADER, Font, read_widths
+from sci.text_widths import wrap, measure, measure_all, check_widths
+
+HEIGHT = 8
+
+
+def write_font(path, widths):
+    # every char is a filled rectangle of its width
+    offsets = []
+    chars = b''
+    base = 6 + 2 * len(widths)
+    for width in widths:
+        offsets.append(base + len(chars))
+        chars += bytes([width, HEIGHT]) + b'\xff' * (((width + 7) // 8) * HEIGHT)
+    path.write_bytes(SIERRA_FONT_HEADER + struct.pack('<HHH', 0, len(widths), HEIGHT) +
+                     struct.pack(f'<{len(widths)}H', *offsets) + chars)
+
+
+def get_widths(tmp_path):
+    widths = [4] * 256
+    widths[ord(' ')] = 2
+    widths[ord('W')] = 10
+    write_font(tmp_path / '0.fon', widths)
+    return read_widths(tmp_path / '0.fon')
+
+
+def test_read_widths(tmp_path):
+    widths, height = get_widths(tmp_path)
+    font = Font(tmp_path / '0.fon')
+    assert height == font.general_height == HEIGHT
+    assert [len(char.lines[0]) for char in font.chars] == list(widths[:font.num_of_chars])
+
+
+def test_wrap(tmp_path):
+    widths, _ = get_widths(tmp_path)
+    assert wrap(b'', widths, 20) == [0]
+    assert wrap(b'abcde', widths, 20) == [20]
+    # at the last space which fits, which isn't displayed
+    assert wrap(b'ab cd ef', widths, 20) == [18, 8]
+    assert wrap(b'abc defg', widths, 16) == [12, 16]
+    # words longer than a line are broken
+    assert wrap(b'abcdefgh ab', widths, 20) == [20, 12, 8]
+    assert wrap(b'WWW', widths, 5) == [10, 10, 10]
+    assert wrap(b'ab\r\ncd\n\nW', widths, 20) == [8, 8, 0, 10]
+
+
+def test_check_widths(tmp_path):
+    widths, _ = get_widths(tmp_path)
+    assert measure('ab |f1|cd|c|', widths, HEIGHT, 20) == (1, 18, HEIGHT)
+    assert measure('שלום עולם', widths, HEIGHT, 20) == (2, 16, 2 * HEIGHT)
+
+    (tmp_path / 'messages.csv').write_text('noun,translation\n1,short\n2,\n3,a much longer text\n4,WWWWWWW\n',
+                                           encoding='utf-8')
+    assert check_widths(tmp_path / 'messages.csv', tmp_path / '0.fon', tmp_path / 'overflow.csv', 40, 16,
+                        'translation') == (1, 3)
+    assert (tmp_path / 'overflow.csv').read_text(encoding='utf-8').splitlines() == [
+        'noun,translation,lines,width,height',
+        '3,a much longer text,3,24,24',
+    ]
+
+
+def test_measure_all(tmp_path):
+    widths, _ = get_widths(tmp_path)
+    texts = ['', 'ab', 'ab cd ef', 'a\nb', 'שלום |f1|עולם', 'WWW']
+    assert measure_all(texts, widths, HEIGHT, 20) == [measure(text, widths, HEIGHT, 20) for text in texts]
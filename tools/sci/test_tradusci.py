@@ -0,0 +1,70 @@
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+from sci.tradusci_export import MessageHeader, load_msg_file, generate_rows, SIERRA_CODEPAGE, \
+    SCI_01, SCI_02_B, SCI_02_C, SCI_02_D, SCI_05, SCI_06, SCI32_100
+from sci.tradusci_import import save_msg_file
+
+KEYS = ('noun', 'verb', 'condition', 'sequence', 'talker', 'padding', 'text', 'translation', 'comment_padding',
+        'comment_text')
+ENCODING = {'encoding': SIERRA_CODEPAGE, 'errors': 'surrogateescape'}
+
+
+def get_lines(mversion, with_comments):
+    # like the rows of tradusci_export's csv
+    lines = []
+    for i, text in enumerate(['Hello', '', 'a "quoted", with comma', 'two\r\nlines', 'caf\x82']):
+        if mversion == SCI_01:
+            line = {'noun': '0', 'verb': '0', 'condition': '0', 'sequence': '0', 'talker': str(i), 'padding': '07'}
+        else:
+            padding = '00aabb' if mversion in {SCI_02_B, SCI_02_C, SCI_02_D} else '00aabbcc'
+            line = {'noun': str(i), 'verb': '1', 'condition': '2', 'sequence': '1', 'talker': '99', 'padding': padding}
+        line.update({'text': text.encode('latin-1').decode(SIERRA_CODEPAGE), 'translation': '',
+                     'comment_padding': '', 'comment_text': ''})
+        if with_comments:
+            line['comment_padding'] = {SCI_01: '0102', SCI_02_B: '', SCI_02_C: '', SCI_02_D: ''}.get(mversion,
+                                                                                                     '010203040506')
+            line['comment_text'] = f'comment {i}' if i % 2 else ''
+        lines.append(line)
+    return lines
+
+
+def load_lines(data):
+    header, mversion, phrases, comments = load_msg_file(io.BytesIO(data))
+    return header, [dict(zip(KEYS, (str(x) for x in row))) for row in generate_rows(phrases, comments, mversion,
+                                                                                       ENCODING)]
+
+
+@pytest.mark.parametrize('with_comments', [False, True])
+@pytest.mark.parametrize('mversion', [SCI_01, SCI_02_B, SCI_02_C, SCI_02_D, SCI_05, SCI_06, SCI32_100])
+def test_round_trip(mversion, with_comments):
+    header = MessageHeader(mversion | 0x12, None, 17, 5)
+    lines = get_lines(mversion, with_comments)
+    data = save_msg_file(header, lines)
+
+    loaded_header, loaded = load_lines(data)
+    assert loaded_header.version_id == header.version_id
+    assert loaded_header.phrases_count == len(lines)
+    if mversion >= SCI_05:
+        assert loaded_header.last_msg_num == header.last_msg_num
+    if mversion == SCI_01:
+        # not in the file
+        for line in lines:
+            line.update({'noun': '0', 'verb': '0', 'condition': '0', 'sequence': '0'})
+    for line, loaded_line in zip(lines, loaded):
+        for key in KEYS:
+            if key != 'comment_padding' or with_comments:
+                assert loaded_line[key] == line[key], key
+    assert save_msg_file(loaded_header, loaded) == data
+
+
+def test_translation():
+    lines = get_lines(SCI_05, True)
+    lines[0]['translation'] = 'שלום'
+    _, loaded = load_lines(save_msg_file(MessageHeader(SCI_05, None, 5, 5), lines))
+    assert loaded[0]['text'].encode(SIERRA_CODEPAGE) == 'שלום'.encode('windows-1255')
+    assert loaded[1]['text'] == lines[1]['text']
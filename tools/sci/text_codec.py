@@ -0,0 +1,38 @@
+# The codepages of the game's texts and of the translations, and the conversions between them and unicode (the csv),
+# shared by the exporters and importers.
+# These codepages are single byte ones, whose codecs are charmap tables of 256 entries applied by one C call
+# per string - so texts are decoded and encoded whole, never char by char.
+# Bytes which aren't defined in a codepage are kept as surrogates (see 'surrogateescape') instead of failing the export;
+# they survive a round trip through a csv which is written and read with errors='surrogateescape' too.
+# The escapes of control codes aren't here: the assembler's are in asm_lib/misc.py (escape_string), and the
+# spreadsheets' (openpyxl's _xHHHH_) are undone in tools/shared/google_drive.py, as both run standalone.
+
+SIERRA_CODEPAGE = 'CP437'
+TRANSLATION_CODEPAGE = 'windows-1255'
+ERRORS = 'surrogateescape'
+
+
+def decode(data, codepage=SIERRA_CODEPAGE):
+    return data.decode(codepage, ERRORS)
+
+
+def encode(text, codepage=TRANSLATION_CODEPAGE):
+    return text.encode(codepage, ERRORS)
+
+
+def read_cstring(data, pos):
+    # the bytes from pos until the null terminator, and the position after it
+    end = data.index(b'\0', pos)
+    return data[pos:end], end + 1
+
+
+def split_cstrings(data):
+    # all the null terminated strings of data (unterminated bytes at its end are dropped)
+    return data.split(b'\0')[:-1]
+
+
+if __name__ == '__main__':
+    print("This script shouldn't be directly called")
+    import sys
+
+    sys.exit(1)
@@ -0,0 +1,138 @@
+# Measures the translations of a csv (messages.csv by default) with the game's font, to find the ones which overflow
+# their box before importing them, instead of in the game.
+# The font is read once to a table of its chars' widths (see fontlib.read_widths), and each text is wrapped to lines
+# like the game does it (at the last space which fits, or in the middle of a word which doesn't fit a line by itself)
+# using sums over numpy arrays, instead of rendering it.
+# The widths of all the texts are summed at once; only the texts longer than a line are wrapped one by one
+
+import argparse
+import csv
+import re
+import sys
+
+import numpy as np
+
+from sci import config
+from sci.misc.fontlib import read_widths
+from sci.text_codec import TRANSLATION_CODEPAGE, encode
+
+SPACE = ord(' ')
+# e.g. |f1| or |c2| (font and color changes) - aren't displayed
+CONTROL_CODES = re.compile(rb'\|[a-zA-Z][^|]*\|')
+
+
+def wrap(text, widths, max_width):
+    # text: bytes, in the codepage of the font; returns the width of each of its lines
+    lines = []
+    for paragraph in text.replace(b'\r\n', b'\n').split(b'\n'):
+        codes = np.frombuffer(paragraph, dtype=np.uint8)
+        # ends[i]: the width of paragraph[:i + 1]
+        ends = np.cumsum(widths[codes])
+        spaces = np.flatnonzero(codes == SPACE)
+        start = 0
+        base = 0
+        if not len(codes):
+            lines.append(0)
+        while start < len(codes):
+            # paragraph[start:end] fits the line
+            end = int(np.searchsorted(ends, base + max_width, side='right'))
+            if end >= len(codes):
+                lines.append(int(ends[-1] - base))
+                break
+            last_space = np.searchsorted(spaces, end, side='right') - 1
+            if last_space >= 0 and spaces[last_space] > start:
+                # the space itself is dropped
+                end = int(spaces[last_space])
+                next_start = end + 1
+            else:
+                end = next_start = max(end, start + 1)
+            lines.append(int(ends[end - 1] - base))
+            start = next_start
+            base = ends[start - 1]
+    return lines
+
+
+def encode_text(text, encoding=TRANSLATION_CODEPAGE):
+    # the text as the game displays it: in the codepage of the font, without the control codes
+    return CONTROL_CODES.sub(b'', encode(text, encoding)).replace(b'\r\n', b'\n')
+
+
+def measure(text, widths, height, max_width, encoding=TRANSLATION_CODEPAGE):
+    # (number of lines, width, height) of the wrapped text
+    lines = wrap(encode_text(text, encoding), widths, max_width)
+    return len(lines), max(lines), len(lines) * height
+
+
+def measure_all(texts, widths, height, max_width, encoding=TRANSLATION_CODEPAGE):
+    # like measure, for many texts at once: the width of every text is summed for all of them together,
+    # and only the texts which don't fit a single line are wrapped (line by line, see wrap)
+    encoded = [encode_text(text, encoding) for text in texts]
+    codes = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    # the sums of the widths (and of the newlines) of codes[:i]
+    summed_widths = np.concatenate(([0], np.cumsum(widths[codes])))
+    summed_newlines = np.concatenate(([0], np.cumsum(codes == ord('\n'))))
+    totals = summed_widths[ends] - summed_widths[starts]
+    single_line = (totals <= max_width) & (summed_newlines[ends] == summed_newlines[starts])
+
+    results = []
+    for text, total, single in zip(encoded, totals.tolist(), single_line.tolist()):
+        if single:
+            results.append((1, total, height))
+        else:
+            lines = wrap(text, widths, max_width)
+            results.append((len(lines), max(lines), len(lines) * height))
+    return results
+
+
+def measure_csv(csv_file, fontfile, max_width, max_height, column, encoding=TRANSLATION_CODEPAGE):
+    # yields (row, number of lines, width, height, overflow) of every row with a text in column
+    widths, height = read_widths(fontfile)
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.DictReader(f) if row[column]]
+    for row, (lines, width, text_height) in zip(rows, measure_all([row[column] for row in rows], widths, height,
+                                                                  max_width, encoding)):
+        yield row, lines, width, text_height, width > max_width or text_height > max_height
+
+
+def check_widths(csv_file, fontfile, output, max_width, max_height, column, encoding=TRANSLATION_CODEPAGE):
+    # writes the rows which overflow the box to output, with their measures; returns (overflowing, measured) rows
+    measured = 0
+    overflowing = 0
+    with open(output, 'w', newline='', encoding='utf-8') as out:
+        writer = None
+        for row, lines, width, height, overflow in measure_csv(csv_file, fontfile, max_width, max_height, column,
+                                                               encoding):
+            measured += 1
+            if not overflow:
+                continue
+            overflowing += 1
+            if writer is None:
+                writer = csv.DictWriter(out, list(row) + ['lines', 'width', 'height'])
+                writer.writeheader()
+            writer.writerow({**row, 'lines': lines, 'width': width, 'height': height})
+    return overflowing, measured
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Finds the translations which don't fit their box in the game's font "
+                    "(exits with an error if there are any)",
+    )
+    parser.add_argument('csv_file', help='csv file with the translations')
+    parser.add_argument('font', help="the game's font file (e.g. 0.fon or font.000)")
+    parser.add_argument('-o', '--output', default='overflow.csv', help='csv file to write the overflowing rows to')
+    parser.add_argument('-w', '--max-width', type=int, default=200, help="width of the box's text, in pixels")
+    parser.add_argument('-H', '--max-height', type=int, default=120, help="height of the box's text, in pixels")
+    parser.add_argument('-c', '--column', default=config.messages_keys['translation'],
+                        help='name of the column of the translations')
+    parser.add_argument('-e', '--encoding', default=TRANSLATION_CODEPAGE, help='codepage of the font')
+    args = parser.parse_args()
+
+    overflowing, measured = check_widths(args.csv_file, args.font, args.output, args.max_width, args.max_height,
+                                         args.column, args.encoding)
+    print(f'{overflowing} of {measured} translations overflow their box (see {args.output})')
+    sys.exit(1 if overflowing else 0)
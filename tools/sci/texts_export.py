@@ -3,13 +3,11 @@
 import argparse
 import glob
 import csv
-import operator
 import os
-from functools import partial
-from itertools import takewhile
 from pathlib import Path
 
 import config
+from text_codec import decode, split_cstrings
 
 KEYS = ('room', 'idx', 'original', 'translated', 'comments')
 ENCODING_IN = 'windows-1252'
@@ -18,31 +16,16 @@ SIERRA_TEXT_HEADER = b'\x83'
 TEXTS_PATTERNS = ["text.*", "*.tex"]
 
 
-def read_char(stream):
-    c = stream.read(1)
-    if not c:
-        raise EOFError('Got Nothing')
-    return c
-
-
-def safe_readcstr(stream):
-    bound_read = iter(partial(read_char, stream), b'')
-    return b''.join(takewhile(partial(operator.ne, b'\00'), bound_read))
-
-
-def loop_strings(stream):
-    while True:
-        try:
-            yield safe_readcstr(stream).decode(ENCODING_IN)
-        except EOFError as e:
-            break
+def loop_strings(data):
+    for s in split_cstrings(data):
+        yield decode(s, ENCODING_IN)
 
 
 def texts_export(gamedir, csvdir):
     filenames = [filename for pattern in TEXTS_PATTERNS for filename in Path(gamedir).glob(pattern)]
     if filenames:
         with open(os.path.join(csvdir, config.texts_csv_filename), 'w', newline='',
-                  encoding=ENCODING_OUT) as output_file:
+                  encoding=ENCODING_OUT, errors='surrogateescape') as output_file:
             dict_writer = csv.DictWriter(output_file, fieldnames=KEYS)
             dict_writer.writeheader()
 
@@ -50,7 +33,7 @@ def texts_export(gamedir, csvdir):
                 suffix = filename.suffix[1:]
                 room = filename.stem if suffix == "tex" else suffix
                 with open(filename, 'rb') as f:
-                    for idx, message in enumerate(loop_strings(f)):
+                    for idx, message in enumerate(loop_strings(f.read())):
                         if idx == 0:
                             assert message.encode(ENCODING_IN) == SIERRA_TEXT_HEADER
                         else:
@@ -4,19 +4,20 @@ import argparse
 import os
 import csv
 import config
+from csv_groups import group_rows
+from text_codec import encode
 
-ENCODING = 'windows-1255'
 SIERRA_TEXT_HEADER = b'\x83\0'
 
 
 def texts_import(csvdir, patchesdir):
-    with open(os.path.join(csvdir, config.texts_csv_filename), newline='', encoding='utf-8') as csvfile:
-        texts = [{k: v for k, v in row.items()}
-                 for row in csv.DictReader(csvfile, skipinitialspace=True)]
-    rooms = list(set([entry['room'] for entry in texts if entry['room'] != '']))
-    rooms.sort(key=float)
-    for room in rooms:
-        entries = [entry for entry in texts if entry['room'] == room]
+    def read_rows():
+        with open(os.path.join(csvdir, config.texts_csv_filename), newline='', encoding='utf-8',
+                  errors='surrogateescape') as csvfile:
+            yield from csv.DictReader(csvfile, skipinitialspace=True)
+
+    # each room is written as soon as its rows are read
+    for room, entries in group_rows(read_rows, lambda entry: entry['room']):
         output_file = os.path.join(patchesdir, 'text.' + str(int(float(room))).zfill(3))
 
         if set([entry['translated'] for entry in entries]) == {''}:
@@ -32,7 +33,7 @@ def texts_import(csvdir, patchesdir):
                 else:
                     txt = entry['original']
 
-                out_file.write(str.encode(txt, ENCODING))
+                out_file.write(encode(txt))
                 out_file.write(b'\0')
 
 
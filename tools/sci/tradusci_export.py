@@ -1,15 +1,18 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
 from dataclasses import astuple, dataclass
 import json
+import os
 import struct
 import sys
 from typing import Optional
 
 from sci.resource_archive.loader import load_resources
+from sci.text_codec import SIERRA_CODEPAGE
 
 
 MESSAGE_PATTERNS = ["message.*", "*.msg"]
-SIERRA_CODEPAGE = 'CP437'
 
 PATCH80 = 0x008F
 PATCH = 0x000F
@@ -33,25 +36,18 @@ TRADUSCI2 = 2
 UINT16LE = struct.Struct('<H')
 UINT32LE = struct.Struct('<I')
 
-def read_uint16le(stream):
-    return UINT16LE.unpack(stream.read(UINT16LE.size))[0]
+def read_uint16le(data, pos):
+    return UINT16LE.unpack_from(data, pos)[0]
 
-def read_uint32le(stream):
-    return UINT32LE.unpack(stream.read(UINT32LE.size))[0]
+def read_uint32le(data, pos):
+    return UINT32LE.unpack_from(data, pos)[0]
 
-def read_until_null(stream):
-    result = bytearray()
-    while True:
-        char = stream.read(1)
-        if not char or char == b'\x00':
-            break
-        result.extend(char)
-    return bytes(result)
-
-
-def escape_quotes(msg):
-    msg = msg.replace('"', '""')
-    return f'"{msg}"'
+def read_until_null(data, pos):
+    # the string (without the null), and the position after it
+    end = data.find(b'\x00', pos)
+    if end == -1:
+        return data[pos:], len(data)
+    return data[pos:end], end + 1
 
 
 @dataclass
@@ -62,30 +58,35 @@ class MessageHeader:
     phrases_count: Optional[int]
 
 
-def read_header(stream):
-    version_id = read_uint32le(stream)
+def read_header(data, pos):
+    version_id = read_uint32le(data, pos)
+    pos += 4
     comment_pos = None
     last_msg_num = None
     if version_id & 0xFFFFFF00 > SCI_01:
-        comment_pos = read_uint16le(stream)
+        comment_pos = read_uint16le(data, pos)
+        pos += 2
     if version_id & 0xFFFFFF00 >= SCI_05:
-        last_msg_num = read_uint16le(stream)
-    phrases_count = read_uint16le(stream)
-    return MessageHeader(version_id, comment_pos, last_msg_num, phrases_count)
+        last_msg_num = read_uint16le(data, pos)
+        pos += 2
+    phrases_count = read_uint16le(data, pos)
+    pos += 2
+    return MessageHeader(version_id, comment_pos, last_msg_num, phrases_count), pos
 
 
 
 
 # Based on TraduSCI source code available at https://erolfi.wordpress.com/tradusci/
 def load_msg_file(stream):
+    # the whole file is read once, then parsed by positions in it
+    data = stream.read()
     offset = 0
-    patch_id = read_uint16le(stream)
+    patch_id = read_uint16le(data, 0)
 
     if patch_id in {PATCH, PATCH80}:
         offset = 2
-    
-    stream.seek(offset)
-    header = read_header(stream)
+
+    header, pos = read_header(data, offset)
 
     mversion = header.version_id & 0xFFFFFF00
     assert mversion in {SCI_01, SCI_02_B, SCI_02_C, SCI_02_D, SCI_05, SCI_06, SCI32_100}, hex(mversion)
@@ -109,35 +110,39 @@ def load_msg_file(stream):
         unk_b_count2 = 2
     elif mversion in {SCI_02_B, SCI_02_C, SCI_02_D}:
         unk_b_count2 = 8
-    
-    tradusci2_data_pos = 0
 
-    oldpos = stream.tell()
-    stream.seek((unk_b_count2 + 2) * t_count, 1)
+    tradusci2_data_pos = 0
 
-    temp_sign = read_until_null(stream)
+    # the phrases table
+    table_pos = pos
+    temp_sign, pos = read_until_null(data, pos + (unk_b_count2 + 2) * t_count)
 
     tradusci_session = {}
 
     if temp_sign == TRADUSCI1_SIGN:
         tradusci_format = OLDTRADUSCI
-        has_comments = stream.read(1)
-        tradusci_session['current_string'] = read_uint16le(stream)
+        has_comments = data[pos:pos + 1]
+        tradusci_session['current_string'] = read_uint16le(data, pos + 1)
         tradusci_session['font_size'] = 18
     elif temp_sign == TRADUSCI2_SIGN:
         tradusci_format = TRADUSCI2
-        has_comments = stream.read(1)
-        tradusci_session['current_string'] = read_uint16le(stream)
-        tradusci2_data_pos = read_uint32le(stream)
+        has_comments = data[pos:pos + 1]
+        tradusci_session['current_string'] = read_uint16le(data, pos + 1)
+        tradusci2_data_pos = read_uint32le(data, pos + 3)
+        pos += 7
         tradusci_session['font_size'] = 18
-        if read_uint16le(stream) == 0xF00F:
-            tradusci_session['font_size'] = ord(stream.read(1))
+        if read_uint16le(data, pos) == 0xF00F:
+            tradusci_session['font_size'] = data[pos + 2]
+            pos += 1
+        pos += 2
         tradusci_session['order'] = 0  # ByIndex
-        if read_uint16le(stream) == 0xE00E:
-            tradusci_session['order'] = ord(stream.read(1))
+        if read_uint16le(data, pos) == 0xE00E:
+            tradusci_session['order'] = data[pos + 2]
+            pos += 1
+        pos += 2
         tradusci_session['window'] = b''
-        if read_uint16le(stream) == 0xBAAB:
-            tradusci_session['window'] = stream.read(3 + 8)
+        if read_uint16le(data, pos) == 0xBAAB:
+            tradusci_session['window'] = data[pos + 2:pos + 2 + 3 + 8]
 
     elif temp_sign[:8] == TRADUSCI_SIGN:
         raise ValueError('newer tradusci version')
@@ -146,43 +151,28 @@ def load_msg_file(stream):
         tradusci_session['current_string'] = 0
         tradusci_session['font_size'] = 18
 
-    stream.seek(oldpos)
-
     for i in range(t_count):
-        phrases[i]['meta'] = stream.read(unk_b_count1)
+        entry_pos = table_pos + i * (unk_b_count2 + 2)
+        phrases[i]['meta'] = data[entry_pos:entry_pos + unk_b_count1]
 
-        jumpvalue = read_uint16le(stream)
-        oldpos = stream.tell()
-
-        stream.seek(offset + jumpvalue)
+        jumpvalue = read_uint16le(data, entry_pos + unk_b_count1)
 
         if tradusci_format == SIERRA:
-            phrases[i]['string'] = read_until_null(stream)
+            # SCI_01 has no comments position, they come after the last phrase
+            phrases[i]['string'], jumpvalue = read_until_null(data, offset + jumpvalue)
 
         else:
-            temp_str = read_until_null(stream)
+            temp_str, jumpvalue = read_until_null(data, offset + jumpvalue)
             if tradusci_format == TRADUSCI2:
-                jumpvalue = stream.tell()
-                stream.seek(tradusci2_data_pos)
-
-                translated = ord(stream.read(1))
+                translated = data[tradusci2_data_pos]
                 if translated:
-                    if tradusci_format == TRADUSCI2:
-                        stream.seek(-1, 1)
-
-                    phrases[i]['string'] = read_until_null(stream)
+                    phrases[i]['string'], tradusci2_data_pos = read_until_null(data, tradusci2_data_pos)
                     phrases[i]['translation'] = temp_str
                 else:
                     phrases[i]['string'] = temp_str
+                    tradusci2_data_pos += 1
 
-                if tradusci_format == TRADUSCI2:
-                    tradusci2_data_pos = stream.tell()
-
-        if tradusci_format == OLDTRADUSCI:
-            jumpvalue = stream.tell()
-
-        stream.seek(oldpos)
-        phrases[i]['meta'] += stream.read(unk_b_count2 - unk_b_count1)
+        phrases[i]['meta'] += data[entry_pos + unk_b_count1 + 2:entry_pos + unk_b_count2 + 2]
 
     if mversion != SCI_01:
         nouns[0] = 0  # '<generic>'
@@ -191,71 +181,59 @@ def load_msg_file(stream):
 
     if tradusci_format == TRADUSCI2:
         talkers[0] = 0  # '<generic>'
-        if tradusci_format == TRADUSCI2:
-            stream.seek(tradusci2_data_pos)
-
-            try:
-                temp_tag = read_uint16le(stream)
-            except struct.error:
-                temp_tag = 0
-
-            if temp_tag == 0xD00D:
-                for names in (nouns, verbs, conditions, talkers):
-                    idx = ord(stream.read(1))
-                    while idx != 0:
-                        names[idx] = read_until_null(stream)
-                        idx = ord(stream.read(1))
-                temp_tag = read_uint16le(stream)
-                if temp_tag != 0xD0D0:
-                    raise ValueError(temp_tag)
-            else:
-                stream.seek(tradusci2_data_pos)
-
-        rewind = stream.tell()
-        if read_until_null(stream) == b'AMAP':
+        pos = tradusci2_data_pos
+
+        try:
+            temp_tag = read_uint16le(data, pos)
+        except struct.error:
+            temp_tag = 0
+
+        if temp_tag == 0xD00D:
+            pos += 2
+            for names in (nouns, verbs, conditions, talkers):
+                idx = data[pos]
+                pos += 1
+                while idx != 0:
+                    names[idx], pos = read_until_null(data, pos)
+                    idx = data[pos]
+                    pos += 1
+            temp_tag = read_uint16le(data, pos)
+            pos += 2
+            if temp_tag != 0xD0D0:
+                raise ValueError(temp_tag)
+
+        if read_until_null(data, pos)[0] == b'AMAP':
             raise NotImplementedError('Loaded audio map info was not implemented')
-            # audmap_name = read_until_null(stream)
-            # ushort = read_uint16le(stream)
-            # audmap = {'id': 0, 'size': 0}
-
-            # initoffs = tuple(stream.read(4))
 
-            # for i in range(ushort):
-            #     print(stream.read(7))
-        else:
-            stream.seek(rewind)
-
-        futurebox = stream.read()
+        futurebox = data[pos:]
         if futurebox:
             raise ValueError(futurebox)
 
     if mversion > SCI_01:
-        stream.seek(4 + offset)
-        jumpvalue = read_uint16le(stream)
+        jumpvalue = read_uint16le(data, 4 + offset)
         assert jumpvalue == header.comment_pos, (jumpvalue, header.comment_pos)
         jumpvalue += 6 + offset
-    
+
     if tradusci_format == SIERRA:
-        stream.seek(0, 2)
-        has_comments = jumpvalue < stream.tell()
+        has_comments = jumpvalue < len(data)
 
     if has_comments:
-        stream.seek(jumpvalue)
+        pos = jumpvalue
         if mversion == SCI_01:
             unk_b_count1 = 2
-            unk_b_count2 = 0
+            unk_b_count2 = 2
         elif mversion in {SCI_02_B, SCI_02_C, SCI_02_D}:
             unk_b_count1 = 0
             unk_b_count2 = 0
         else:
             unk_b_count1 = 0
             unk_b_count2 = 6
-        
-        for i in range(t_count):
-            comments[i]['meta'] = stream.read(unk_b_count1)
-            comments[i]['string'] = read_until_null(stream)
 
-            comments[i]['meta'] += stream.read(unk_b_count2 - unk_b_count1)
+        for i in range(t_count):
+            comments[i]['meta'] = data[pos:pos + unk_b_count1]
+            comments[i]['string'], pos = read_until_null(data, pos + unk_b_count1)
+            comments[i]['meta'] += data[pos:pos + unk_b_count2 - unk_b_count1]
+            pos += unk_b_count2 - unk_b_count1
 
     return header, mversion, phrases, comments
 
@@ -279,19 +257,55 @@ def generate_rows(phrases, comments, mversion, encoding):
             sequence,
             talker,
             padding.hex(),
-            escape_quotes(original.decode(**encoding)),
-            escape_quotes(translation.decode(**encoding)),
+            original.decode(**encoding),
+            translation.decode(**encoding),
             comment_padding.hex(),
-            escape_quotes(comment_text.decode(**encoding)),
+            comment_text.decode(**encoding),
         )
 
 
-def extract_messages(gamedir, output, encoding, stub):
-    filenames = list(load_resources(
+def is_message_file(fname):
+    return fname.stem.isnumeric() or fname.suffix.lstrip('.').isnumeric()
+
+
+def read_messages(fname, encoding):
+    # fname: a patch file or an archive entry (which is decompressed when opened)
+    with fname.open('rb') as stream:
+        header, mversion, phrases, comments = load_msg_file(stream)
+    return astuple(header), [(fname.name, *info) for info in generate_rows(phrases, comments, mversion, encoding)]
+
+
+def init_worker(gamedir):
+    # every worker loads the resources (and opens the archives) by itself, and finds them by name
+    init_worker.resources = load_resources(gamedir, patterns=MESSAGE_PATTERNS)
+    init_worker.found = {}
+
+
+def read_messages_by_name(name, encoding):
+    while name not in init_worker.found:
+        fname = next(init_worker.resources)
+        init_worker.found[fname.name] = fname
+    return read_messages(init_worker.found[name], encoding)
+
+
+def read_all_messages(gamedir, filenames, encoding, jobs):
+    # yields (header, rows) of each file, in the same order as filenames
+    if jobs == 1:
+        for fname in filenames:
+            yield read_messages(fname, encoding)
+        return
+    jobs = jobs or os.cpu_count()
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(gamedir,)) as executor:
+        yield from executor.map(read_messages_by_name, [fname.name for fname in filenames],
+                                [encoding] * len(filenames), chunksize=max(1, len(filenames) // (jobs * 4)))
+
+
+def extract_messages(gamedir, output, encoding, stub, jobs=1):
+    filenames = [fname for fname in load_resources(
         gamedir,
         patterns=MESSAGE_PATTERNS,
         # patches=None,
-    ))
+    ) if is_message_file(fname)]
 
     encoding = {
         'encoding': encoding,
@@ -314,16 +328,12 @@ def extract_messages(gamedir, output, encoding, stub):
 
     stub_info = {}
     with open(output, 'w', encoding='utf-8', errors='surrogateescape') as out:
-        print(*headers, sep=',', file=out)
-        for fname in filenames:
-            if not (fname.stem.isnumeric() or fname.suffix.lstrip('.').isnumeric()):
-                continue
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(headers)
+        for fname, (header, rows) in zip(filenames, read_all_messages(gamedir, filenames, encoding, jobs)):
             print(f'Loading messages from {fname}', file=sys.stderr)
-            with fname.open('rb') as stream:
-                header, mversion, phrases, comments = load_msg_file(stream)
-                stub_info[fname.name] = astuple(header)
-                for info in generate_rows(phrases, comments, mversion, encoding):
-                    print(fname.name, *info, sep=',', file=out)
+            stub_info[fname.name] = header
+            writer.writerows(rows)
     with open(stub, 'w', encoding='utf-8') as stubfile:
         stubfile.write(json.dumps(stub_info))
 
@@ -354,6 +364,13 @@ if __name__ == '__main__':
         default='stub.json',
         help='stub file for message headers',
     )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help='number of processes to read the messages files with (0 - as many as CPUs)',
+    )
     args = parser.parse_args()
 
-    extract_messages(args.gamedir, args.output, args.encoding, args.stub)
+    extract_messages(args.gamedir, args.output, args.encoding, args.stub, args.jobs or None)
@@ -1,11 +1,11 @@
 import argparse
 import csv
-from itertools import groupby
 import json
 import operator
 import os
 from pathlib import Path
 import pathlib
+import struct
 import sys
 
 from sci.tradusci_export import (
@@ -19,101 +19,105 @@ from sci.tradusci_export import (
     SCI_05,
     SCI32_100,
     UINT16LE,
-    UINT32LE,
     MessageHeader,
 )
+from sci.csv_groups import group_rows
+from sci.messages_file import get_hash, load_manifest, save_manifest, is_unchanged
+from sci.text_codec import encode
 
 
-def write_uint16le(num):
-    return UINT16LE.pack(num)
+def get_meta(line, mversion):
+    # a phrase's meta data (noun, verb, ...) as read by load_msg_file, without its offset
+    if mversion == SCI_01:
+        return bytes([int(line['talker'])]) + bytes.fromhex(line['padding'])
+    meta = bytes([int(x) for x in operator.itemgetter('noun', 'verb', 'condition', 'sequence', 'talker')(line)])
+    return meta + bytes.fromhex(line['padding'])
+
 
-def write_uint32le(num):
-    return UINT32LE.pack(num)
+def encode_message(line):
+    translation = line.get('translation')
+    if translation:
+        return encode(translation.replace('\n\n', '\r\n'))
+    return encode(line['text'].replace('\n\n', '\r\n'), SIERRA_CODEPAGE)
 
 
 # Based on TraduSCI source code available at https://erolfi.wordpress.com/tradusci/
 def save_msg_file(header, lines):
-    output = bytearray()
-
+    # the whole layout (header, phrases table, strings, comments) is computed first, then written into a buffer of
+    # the exact size
     mversion = header.version_id & 0xFFFFFF00
     patch_id = PATCH if mversion == SCI32_100 else PATCH80
-    output += write_uint16le(patch_id)
-
-    output += write_uint32le(header.version_id)
-    if mversion > SCI_01:
-        output += write_uint16le(0)  # comments_pos
-    if mversion >= SCI_05:
-        output += write_uint16le(header.last_msg_num)
 
-    str_count = len(lines)
-    output += write_uint16le(str_count)
+    # version, comments position, last message number, number of phrases
+    header_format = '<I' + ('H' if mversion > SCI_01 else '') + ('H' if mversion >= SCI_05 else '') + 'H'
+    header_size = struct.calcsize(header_format)
 
+    # a phrase's meta data: unk_b_count1 bytes before its offset, unk_b_count2 in total
     unk_b_count1 = 5
     unk_b_count2 = 9
-    header_size = 10
 
     if mversion == SCI_01:
         unk_b_count1 = 2
         unk_b_count2 = 2
-        header_size = 6
     elif mversion in {SCI_02_B, SCI_02_C, SCI_02_D}:
         unk_b_count2 = 8
-        header_size = 8
-
-    for line in lines:
-        if mversion == SCI_01:
-            output += bytes([line['talker'], bytes.fromhex(line['padding'])[0]])
-            output += write_uint16le(0)
-            output += bytes.fromhex(line['padding'][1:])
-        else:
-            meta = bytes([int(x) for x in operator.itemgetter('noun', 'verb', 'condition', 'sequence', 'talker')(line)])
-            assert len(meta) == unk_b_count1
-            output += meta
-            output += write_uint16le(0)
-            assert len(bytes.fromhex(line['padding'])) == unk_b_count2 - unk_b_count1, (line['padding'], unk_b_count2,  unk_b_count1)
-            output += bytes.fromhex(line['padding'])
-
-        has_comments = bool(line['comment_padding'])
-
-    for idx, line in enumerate(lines):
-        currlen = len(output) - 2
-
-        translation = line.get('translation')
-        print(line)
-        if translation is not None:
-            output += translation.replace('\n\n', '\r\n').encode('windows-1255') + b'\0'
-        else:
-            output += line['text'].replace('\n\n', '\r\n').encode(SIERRA_CODEPAGE) + b'\0'
 
-        base_pos = 2+header_size+(idx*(unk_b_count2 + 2)) + unk_b_count1
-        output[base_pos:base_pos+2] = write_uint16le(currlen)
-
-
-    if mversion > SCI_01:
-        comment_pos = len(output) - 8
-        output[6:8] = write_uint16le(comment_pos)
+    metas = [get_meta(line, mversion) for line in lines]
+    for line, meta in zip(lines, metas):
+        assert len(meta) == unk_b_count2, (line['padding'], unk_b_count2, unk_b_count1)
+    messages = [encode_message(line) for line in lines]
 
+    # a comment's meta data: unk_b_count1 bytes before its text, unk_b_count2 in total
+    if mversion == SCI_01:
+        comment_b_count1 = 2
+        comment_b_count2 = 2
+    elif mversion in {SCI_02_B, SCI_02_C, SCI_02_D}:
+        comment_b_count1 = 0
+        comment_b_count2 = 0
+    else:
+        comment_b_count1 = 0
+        comment_b_count2 = 6
+
+    has_comments = any(line['comment_padding'] or line['comment_text'] for line in lines)
+    comments = b''
     if has_comments:
-        if mversion == SCI_01:
-            unk_b_count1 = 2
-            unk_b_count2 = 0
-        elif mversion in {SCI_02_B, SCI_02_C, SCI_02_D}:
-            unk_b_count1 = 0
-            unk_b_count2 = 0
-        else:
-            unk_b_count1 = 0
-            unk_b_count2 = 6
-
-        for line in lines:
-            padding = bytes.fromhex(line['comment_padding'])
-            assert len(padding) == unk_b_count2, (len(padding), unk_b_count2)
-            output += padding[:unk_b_count1]
-            output += line['comment_text'].encode(SIERRA_CODEPAGE) + b'\0'
-            output += padding[unk_b_count1:]
+        comments_paddings = [bytes.fromhex(line['comment_padding']) or bytes(comment_b_count2) for line in lines]
+        for padding in comments_paddings:
+            assert len(padding) == comment_b_count2, (len(padding), comment_b_count2)
+        comments = b''.join(padding[:comment_b_count1] + encode(line['comment_text'], SIERRA_CODEPAGE) + b'\0' +
+                            padding[comment_b_count1:] for line, padding in zip(lines, comments_paddings))
+
+    table_pos = 2 + header_size
+    strings_pos = table_pos + len(lines) * (unk_b_count2 + 2)
+    strings = b'\0'.join(messages) + b'\0' if messages else b''
+    comments_pos = strings_pos + len(strings)
+
+    output = bytearray(comments_pos + len(comments))
+    header_values = [header.version_id]
+    if mversion > SCI_01:
+        # relative to the phrases count
+        header_values.append(comments_pos - 8)
+    if mversion >= SCI_05:
+        header_values.append(header.last_msg_num)
+    header_values.append(len(lines))
+    UINT16LE.pack_into(output, 0, patch_id)
+    struct.pack_into(header_format, output, 2, *header_values)
+
+    pos = strings_pos
+    for idx, (meta, message) in enumerate(zip(metas, messages)):
+        entry_pos = table_pos + idx * (unk_b_count2 + 2)
+        output[entry_pos:entry_pos + unk_b_count1] = meta[:unk_b_count1]
+        # offsets are relative to the header, after the patch id
+        UINT16LE.pack_into(output, entry_pos + unk_b_count1, pos - 2)
+        output[entry_pos + unk_b_count1 + 2:entry_pos + unk_b_count2 + 2] = meta[unk_b_count1:]
+        pos += len(message) + 1
+    output[strings_pos:comments_pos] = strings
+    output[comments_pos:] = comments
     return bytes(output)
 
 
-def import_messages(output, encoding, stub, target):
+def import_messages(output, encoding, stub, target, incremental=False):
+    # incremental: only files whose rows (or stub header) changed since the last import are written
     target = pathlib.Path(target)
 
     encoding = {
@@ -123,18 +127,25 @@ def import_messages(output, encoding, stub, target):
 
     stub_info = json.loads(pathlib.Path(stub).read_text())
 
-    with open(output, 'r', encoding='utf-8', errors='surrogateescape') as text_stream:
-        os.makedirs(target, exist_ok=True)
-        csv_reader = csv.DictReader(text_stream, delimiter=',')
-        grouped = groupby(csv_reader, key=operator.itemgetter('file'))
-        for tfname, group in grouped:
-            if not tfname:
-                continue
-            basename = Path(tfname).name
-            group = list(group)
-            print(f'Loading messages for {basename}', file=sys.stderr)
-            header = MessageHeader(*stub_info[tfname])
-            (target / tfname).write_bytes(save_msg_file(header, group))
+    def read_rows():
+        with open(output, 'r', encoding='utf-8', errors='surrogateescape') as text_stream:
+            yield from csv.DictReader(text_stream, delimiter=',')
+
+    os.makedirs(target, exist_ok=True)
+    # kept next to the csv
+    manifest_dir = pathlib.Path(output).parent
+    manifest = load_manifest(manifest_dir, target)
+    # each file is written as soon as its rows are read
+    for tfname, group in group_rows(read_rows, operator.itemgetter('file')):
+        basename = Path(tfname).name
+        h = get_hash(stub_info[tfname], group)
+        if incremental and is_unchanged(target, manifest, tfname, h):
+            continue
+        print(f'Loading messages for {basename}', file=sys.stderr)
+        header = MessageHeader(*stub_info[tfname])
+        (target / tfname).write_bytes(save_msg_file(header, group))
+        manifest[tfname] = h
+    save_manifest(manifest_dir, target, manifest)
 
 
 if __name__ == '__main__':
@@ -167,6 +178,12 @@ if __name__ == '__main__':
         help='target directory to write files into',
     )
 
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='only write the files whose rows or headers changed since the last import',
+    )
+
     args = parser.parse_args()
 
-    import_messages(args.input, args.encoding, args.stub, args.target)
+    import_messages(args.input, args.encoding, args.stub, args.target, args.incremental)
@@ -4,6 +4,7 @@ import argparse
 import json
 from pathlib import Path
 
+from text_codec import decode, read_cstring
 from vocab_export import classes
 
 JSON_FILE_NAME = "vocab_grammar.json"
@@ -26,11 +27,7 @@ semantics = {
 
 
 def read_string(lob, idx):
-    result = ""
-    while lob[idx] != 0:
-        result += chr(lob[idx])
-        idx += 1
-    return result
+    return decode(read_cstring(lob, idx)[0], 'latin-1')
 
 
 def read_le(l, idx):
@@ -6,7 +6,6 @@ from vocab_grammar_export import JSON_FILE_NAME, ID_DELTA
 from vocab_import import classes
 
 SIERRA_VOCAB_HEADER = b'\x86\0'
-ENCODING = 'windows-1255'
 
 semantics = {
     "verb": 0x141,
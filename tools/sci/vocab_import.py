@@ -6,12 +6,12 @@ import csv
 from pathlib import Path
 
 import config
+from text_codec import encode
 from vocab_export import write_csv
 
 
 VOCAB_NEW = 'vocab.900'
 VOCAB_OLD = 'vocab.000'
-ENCODING = 'windows-1255'
 
 
 classes = {
@@ -143,7 +143,7 @@ def write_vocab_file(entries, patchesdir, output_game_dir):
         binary_vocab.append(same_letters)
         previous_word = word
 
-        chars = str.encode(word[same_letters:], ENCODING)
+        chars = encode(word[same_letters:])
         # print(chars)
         for char in chars:
             assert 0 <= char <= 255